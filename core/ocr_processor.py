@@ -220,6 +220,7 @@ class OCRProcessor:
         # Add image processing configurations
         self.max_image_size = 2000  # Maximum image dimension
         self.batch_size = 1  # Process one file at a time
+        self._in_batch = False  # Set by process_images to defer per-image memory cleanup
         # Force cleanup interval = 300  # 5 minutes between cleanups
         self.cleanup_temp_files(force=True)
         if torch.cuda.is_available():
@@ -334,7 +335,11 @@ class OCRProcessor:
             self._exit_event.set()
             # Force cleanup first
             self.cleanup_temp_files(force=True)
-            # Kill all non-Qt threads
+            # Let pool workers see the exit event and return before anything is killed
+            if hasattr(self, 'thread_pool'):
+                ThreadKiller.terminate_thread_pool(self.thread_pool)
+                self.thread_pool = ThreadPoolExecutor(max_workers=self.max_workers)
+            # Kill all remaining non-Qt threads
             ThreadKiller.terminate_all_threads()
             # Kill processes
             current_pid = os.getpid()
@@ -344,10 +349,6 @@ class OCRProcessor:
                         os.kill(pid, signal.SIGKILL)
                     except:
                         pass
-            # Terminate thread pool
-            if hasattr(self, 'thread_pool'):
-                ThreadKiller.terminate_thread_pool(self.thread_pool)
-                self.thread_pool = ThreadPoolExecutor(max_workers=self.max_workers)
             # Clear GPU memory
             if torch.cuda.is_available():
                 torch.cuda.empty_cache()
@@ -464,6 +465,25 @@ class OCRProcessor:
             raise
         finally:
             self._running_threads.discard(current_thread)
+    def process_images(self, image_paths: List[Union[str, Path]]) -> List[Dict]:
+        """Process a batch of images with the loaded model, cleaning up memory once per batch"""
+        results = []
+        self._in_batch = True
+        try:
+            for image_path in image_paths:
+                if self.is_cancelled or self._force_stop or self._exit_event.is_set():
+                    results.append({"status": "cancelled"})
+                    continue
+                try:
+                    results.append(self.process_image(image_path))
+                except Exception as e:
+                    results.append({"status": "error", "error": str(e)})
+        finally:
+            self._in_batch = False
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        return results
     def _is_last_image_in_folder(self, image_path: Path) -> bool:
         """
         Check if this is the last image to be processed in the folder
@@ -1176,8 +1196,8 @@ class OCRProcessor:
                     bg = Image.new('RGB', img.size, (255, 255, 255))
                     if img.mode == 'P':
                         img = img.convert('RGBA')
-                    # Paste using alpha channel as mask
-                    bg.paste(img, mask=img.split()[3] if img.mode == 'RGBA' else img.split()[1])
+                    # Paste using alpha channel as mask (extracts only the alpha band)
+                    bg.paste(img, mask=img.getchannel('A'))
                     img_to_save = bg
                 elif img.mode != 'RGB':
                     # Convert other modes to RGB as well for compatibility
@@ -1306,11 +1326,12 @@ class OCRProcessor:
             if self.progress_callback:
                 if not self.progress_callback(75, 100):  # HOCR saved
                     return None
-            # Cleanup memory
+            # Cleanup memory (batched callers do this once per batch)
             del result, xml_outputs, docs
-            gc.collect()
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
+            if not self._in_batch:
+                gc.collect()
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
             # Verify HOCR file exists before proceeding
             if not temp_hocr.exists():
                 raise FileNotFoundError(f"HOCR file not created: {temp_hocr}")
@@ -1329,16 +1350,17 @@ class OCRProcessor:
                         # Verify processed image file exists
                         if not processed_image_path.exists():
                             raise FileNotFoundError(f"Image file not found: {processed_image_path}")
-                        # Double-check we're using a compatible image format for HocrTransform
-                        img = Image.open(processed_image_path)
-                        if img.mode != 'RGB':
+                        # Double-check we're using a compatible image format for HocrTransform;
+                        # the header read is cached and reused by hocr_to_pdf
+                        from utils.image_processor import get_image_meta
+                        if get_image_meta(processed_image_path)['mode'] != 'RGB':
                             logger.warning(f"Image {processed_image_path.name} is not RGB, converting")
-                            rgb_img = img.convert('RGB')
+                            with Image.open(processed_image_path) as img:
+                                rgb_img = img.convert('RGB')
                             rgb_path = self.temp_dir / f"rgb_final_{image_path.stem}.png"
                             rgb_img.save(rgb_path)
                             processed_image_path = rgb_path
                             rgb_img.close()
-                        img.close()
                         # Use our custom HOCR to PDF conversion
                         from utils.hocr_to_pdf import hocr_to_pdf
                         success = hocr_to_pdf(
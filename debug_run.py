@@ -20,6 +20,8 @@ def run_with_debug():
         logger.error("Fatal error: %s", e)
         logger.error("Stack trace:", exc_info=True)
         return 1
+    finally:
+        debug.stop_memory_monitoring()
 
 
 if __name__ == "__main__":
@@ -22,18 +22,17 @@ class LogHandler(SafeLogHandler):
     def __init__(self, signals):
         super().__init__()
         self.signals = signals
-        self._recursion_prevention = False
         self.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
     def emit(self, record):
-        if self._recursion_prevention:
+        if getattr(self._tls, 'busy', False):
             return
         try:
-            self._recursion_prevention = True
+            self._tls.busy = True
             msg = self.format(record)
             # Just log to console instead of emitting signal
             print(msg)
         finally:
-            self._recursion_prevention = False
+            self._tls.busy = False
 class OCRWorker(QRunnable):
     def __init__(self, ocr_processor, mode, path):
         super().__init__()
@@ -223,8 +222,7 @@ class OCRWorker(QRunnable):
                 self.ocr.cleanup_temp_files(force=True)  # Force cleanup temp files
             # Stop image processor with proper join
             if hasattr(self, 'image_processor') and self.image_processor:
-                self.image_queue.put(None)  # Send shutdown signal
-                self.image_processor.stop()
+                self.image_processor.stop()  # Sends the shutdown sentinel
                 if self.image_processor.is_alive():
                     self.image_processor.join(timeout=2)  # Wait for thread to finish
                     if self.image_processor.is_alive():
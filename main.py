@@ -391,6 +391,9 @@ if __name__ == '__main__':
         try:
             sys.exit(exit_code)
         except SystemExit:
+            # os._exit skips atexit, so flush buffered log files first
+            import logging
+            logging.shutdown()
             os._exit(exit_code)
     except Exception as e:
         print(f"Fatal startup error: {e}")
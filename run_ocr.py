@@ -2,8 +2,20 @@ from core.ocr_processor import OCRProcessor
 from utils.logging_config import setup_logging
 import logging
 import os
+import queue
+import threading
 from datetime import datetime, UTC
 from pathlib import Path
+# Number of files the read-ahead stage may run ahead of OCR
+PIPELINE_DEPTH = 8
+_PREFETCH_CHUNK = 1 << 20
+# Maximum number of files handed to the OCR stage in one call
+BATCH_SIZE = 32
+# Seconds to wait for more read-ahead files before flushing a partial batch
+BATCH_TIMEOUT = 0.2
+# Supported input file suffixes (lower-case, matched case-insensitively)
+IMAGE_SUFFIXES = tuple('.' + ext for ext in ['jpg', 'jpeg', 'png', 'tif', 'tiff'])
+PDF_SUFFIXES = ('.pdf',)
 def setup_directories():
     # Get the directory where run_ocr.py is located
     base_dir = Path(__file__).parent
@@ -16,28 +28,110 @@ def setup_directories():
     for dir_path in input_dirs.values():
         dir_path.mkdir(parents=True, exist_ok=True)
     return base_dir
-def find_files_recursive(directory: Path, extensions: list) -> list:
+def _walk_filenames(directory: Path):
+    """Yield (root, filenames) for each directory; uses os.fwalk where the platform has it"""
+    if hasattr(os, 'fwalk'):
+        # fwalk resolves entries relative to open directory fds instead of full paths
+        for root, _, filenames, _ in os.fwalk(str(directory), follow_symlinks=False):
+            yield root, filenames
+    else:
+        for root, _, filenames in os.walk(directory, followlinks=False):
+            yield root, filenames
+def find_files_recursive(directory: Path, suffixes: tuple, sort: bool = True) -> list:
     """
     Recursively find files with specific extensions in a directory
     Args:
         directory (Path): Directory to search in
-        extensions (list): List of file extensions to look for
+        suffixes (tuple): Lower-case file suffixes to look for, e.g. ('.jpg', '.png')
+        sort (bool): Sort by path; pass False when the consumer does not need a stable order
     Returns:
         list: List of found files    """
     files = []
     try:
-        # Walk through directory and all subdirectories
-        for root, _, filenames in os.walk(directory):
+        # Walk through directory and all subdirectories, matching names from the listing
+        for root, filenames in _walk_filenames(directory):
             root_path = Path(root)
-            for ext in extensions:
-                # Find files with the current extension
-                files.extend(root_path.glob(f"*.{ext}"))
-        return sorted(files)  # Sort files for consistent processing order
+            for name in filenames:
+                if name.lower().endswith(suffixes):
+                    files.append(root_path / name)
+        if sort:
+            files.sort(key=os.fspath)  # Sort in place for consistent processing order
+        return files
     except Exception as e:
         logging.error("Error searching directory %s: %s", directory, e)
         return files
 
 
+def create_output_dirs(base_dir: Path, input_dir: Path, files: list):
+    """
+    Create the hocr/pdf output subdirectories for all files in one pass
+    Args:
+        base_dir (Path): Base directory containing the output folder
+        input_dir (Path): Input root the files are relative to
+        files (list): Files whose relative parent directories are mirrored
+    """
+    output_dir = base_dir / "output"
+    for rel_dir in {f.relative_to(input_dir).parent for f in files}:
+        (output_dir / "hocr" / rel_dir).mkdir(parents=True, exist_ok=True)
+        (output_dir / "pdf" / rel_dir).mkdir(parents=True, exist_ok=True)
+
+
+def _prefetch_files(files: list, load_q: queue.Queue):
+    """
+    Read files ahead of the OCR stage so disk I/O overlaps with OCR compute
+    Args:
+        files (list): Files to read, in processing order
+        load_q (queue.Queue): Bounded queue feeding the OCR stage, terminated with None
+    """
+    try:
+        for path in files:
+            try:
+                # Pull the file into the OS page cache; the OCR stage re-opens it from there
+                with open(path, 'rb') as f:
+                    while f.read(_PREFETCH_CHUNK):
+                        pass
+            except OSError as e:
+                logging.warning("Read-ahead failed for %s: %s", path, e)
+            load_q.put(path)
+    finally:
+        load_q.put(None)
+
+
+def run_pipeline(files: list, handler, depth: int = PIPELINE_DEPTH,
+                 batch_size: int = BATCH_SIZE, batch_timeout: float = BATCH_TIMEOUT):
+    """
+    Run handler over batches of files while a producer thread reads the next files ahead
+    Args:
+        files (list): Files to process
+        handler (callable): Called with a list of file paths on the calling thread
+        depth (int): Maximum number of files read ahead of the handler
+        batch_size (int): Maximum number of files per handler call
+        batch_timeout (float): Seconds to wait for more files before flushing a partial batch
+    """
+    load_q = queue.Queue(maxsize=depth)
+    producer = threading.Thread(target=_prefetch_files, args=(files, load_q),
+                                name="OCRPrefetch", daemon=True)
+    producer.start()
+    batch = []
+    while True:
+        try:
+            # Block for the first file of a batch, then flush if read-ahead stalls
+            path = load_q.get(timeout=batch_timeout) if batch else load_q.get()
+        except queue.Empty:
+            handler(batch)
+            batch = []
+            continue
+        if path is None:
+            break
+        batch.append(path)
+        if len(batch) >= batch_size:
+            handler(batch)
+            batch = []
+    if batch:
+        handler(batch)
+    producer.join()
+
+
 def main():
     # Get base directory and setup directories
     base_dir = setup_directories()
@@ -54,48 +148,49 @@ def main():
     processor = OCRProcessor(
         output_base_dir=str(base_dir / "output")
     )
-    # Define supported extensions
-    image_extensions = ['jpg', 'jpeg', 'png', 'tif', 'tiff']
-    pdf_extensions = ['pdf']
     # Process all images in the input/images directory and its subdirectories
     images_dir = base_dir / "input" / "images"
     pdfs_dir = base_dir / "input" / "pdfs"    # Process images
     if images_dir.exists():
-        image_files = find_files_recursive(images_dir, image_extensions)
+        image_files = find_files_recursive(images_dir, IMAGE_SUFFIXES)
         if image_files:
             logger.info("Found %d images to process", len(image_files))
-            for image_file in image_files:
-                try:
-                    # Create relative path structure in output directory
-                    rel_path = image_file.relative_to(images_dir)
-                    logger.info("Processing image: %s", rel_path)
-                    # Create output subdirectories if needed
-                    output_subdir = base_dir / "output" / "hocr" / rel_path.parent
-                    output_subdir.mkdir(parents=True, exist_ok=True)
-                    output_subdir = base_dir / "output" / "pdf" / rel_path.parent
-                    output_subdir.mkdir(parents=True, exist_ok=True)
-                    processor.process_image(str(image_file))
-                except Exception as e:
-                    logger.error("Failed to process image %s: %s", rel_path, e)
+            # Create relative path structure in output directory once for all files
+            create_output_dirs(base_dir, images_dir, image_files)
+            # Per-file lines are debug only. The root logger is left at DEBUG and the
+            # handlers filter, so check once whether any handler would emit them
+            log_each_file = logger.isEnabledFor(logging.DEBUG) and any(
+                handler.level <= logging.DEBUG for handler in logger.handlers)
+            done = 0
+            def process_image_batch(batch):
+                nonlocal done
+                logger.info("Processing images %d-%d of %d", done + 1, done + len(batch), len(image_files))
+                if log_each_file:
+                    for image_file in batch:
+                        logger.debug("Processing image: %s", image_file.relative_to(images_dir))
+                done += len(batch)
+                # One call per batch so the processor cleans up memory once per batch
+                results = processor.process_images([str(f) for f in batch])
+                for image_file, result in zip(batch, results):
+                    if result.get("status") == "error":
+                        logger.error("Failed to process image %s: %s", image_file, result.get("error"))
+            run_pipeline(image_files, process_image_batch)
         else:
             logger.info("No image files found in input/images directory")    # Process PDFs
     if pdfs_dir.exists():
-        pdf_files = find_files_recursive(pdfs_dir, pdf_extensions)
+        pdf_files = find_files_recursive(pdfs_dir, PDF_SUFFIXES)
         if pdf_files:
             logger.info("Found %d PDFs to process", len(pdf_files))
-            for pdf_file in pdf_files:
-                try:
-                    # Create relative path structure in output directory
-                    rel_path = pdf_file.relative_to(pdfs_dir)
-                    logger.info("Processing PDF: %s", rel_path)
-                    # Create output subdirectories if needed
-                    output_subdir = base_dir / "output" / "hocr" / rel_path.parent
-                    output_subdir.mkdir(parents=True, exist_ok=True)
-                    output_subdir = base_dir / "output" / "pdf" / rel_path.parent
-                    output_subdir.mkdir(parents=True, exist_ok=True)
-                    processor.process_pdf(str(pdf_file))
-                except Exception as e:
-                    logger.error("Failed to process PDF %s: %s", rel_path, e)
+            # Create relative path structure in output directory once for all files
+            create_output_dirs(base_dir, pdfs_dir, pdf_files)
+            def process_pdf_batch(batch):
+                for pdf_file in batch:
+                    try:
+                        logger.info("Processing PDF: %s", pdf_file.relative_to(pdfs_dir))
+                        processor.process_pdf(str(pdf_file))
+                    except Exception as e:
+                        logger.error("Failed to process PDF %s: %s", pdf_file, e)
+            run_pipeline(pdf_files, process_pdf_batch)
         else:
             logger.info("No PDF files found in input/pdfs directory")    # Enhanced summary logging
     logger.info("=" * 80)
@@ -2,4 +2,11 @@ from .process_manager import ProcessManager
 from .thread_killer import ThreadKiller
 from .logging_config import setup_logging
 from .safe_logger import SafeLogHandler
-__all__ = ['ProcessManager', 'ThreadKiller', 'setup_logging', 'SafeLogHandler']
+__all__ = ['ProcessManager', 'ThreadKiller', 'setup_logging', 'SafeLogHandler', 'hocr_to_pdf_batch']
+def __getattr__(name):
+    # hocr_to_pdf pulls in numpy, lxml and PIL; only load it when it is asked for
+    if name == 'hocr_to_pdf_batch':
+        from .hocr_to_pdf import hocr_to_pdf_batch
+        globals()[name] = hocr_to_pdf_batch
+        return hocr_to_pdf_batch
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,9 +1,11 @@
 import sys
+import atexit
 import logging
 import traceback
 from pathlib import Path
 from datetime import datetime
 import threading
+import time
 import psutil
 import torch
 class CrashHandler:
@@ -15,13 +17,24 @@ class CrashHandler:
         # Setup crash log file
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.crash_log = self.log_dir / f"crash_{timestamp}.log"
+        # One line-buffered handle, opened on the first crash and kept open;
+        # the lock keeps records from different threads from interleaving
+        self._fh = None
+        self._lock = threading.Lock()
         # Install exception hooks
         sys.excepthook = self.handle_exception
         threading.excepthook = self.handle_thread_exception
+    def _crash_file(self):
+        """Return the crash log handle, opening it on first use (call with lock held)"""
+        if self._fh is None:
+            self._fh = open(self.crash_log, 'a', encoding='utf-8', buffering=1)
+            atexit.register(self._fh.close)
+        return self._fh
     def handle_exception(self, exc_type, exc_value, exc_traceback):
         """Handle uncaught exceptions"""
         try:
-            with open(self.crash_log, 'a', encoding='utf-8') as f:
+            with self._lock:
+                f = self._crash_file()
                 f.write("\n=== Uncaught Exception ===\n")
                 f.write(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
                 f.write(f"Type: {exc_type.__name__}\n")
@@ -46,7 +59,8 @@ class CrashHandler:
     def handle_thread_exception(self, args):
         """Handle uncaught thread exceptions"""
         try:
-            with open(self.crash_log, 'a', encoding='utf-8') as f:
+            with self._lock:
+                f = self._crash_file()
                 f.write("\n=== Uncaught Thread Exception ===\n")
                 f.write(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
                 f.write(f"Thread: {args.thread.name}\n")
@@ -123,18 +137,21 @@ class DebugLogger:
             for i in range(torch.cuda.device_count()):
                 self.logger.info(f"GPU {i}: {torch.cuda.get_device_name(i)}")
         self.logger.info("=" * 80)
-    def _start_memory_monitoring(self):
+    def _start_memory_monitoring(self, interval: float = 10):
         """Monitor memory usage periodically"""
+        self._stop_event = threading.Event()
+        process = psutil.Process()
+        cuda_available = torch.cuda.is_available()
         def log_memory():
-            while True:
+            next_run = time.monotonic()
+            while not self._stop_event.is_set():
                 try:
-                    process = psutil.Process()
                     mem_info = process.memory_info()
                     self.memory_logger.info(
                         f"Memory: RSS={mem_info.rss/1024/1024:.1f}MB, "
                         f"VMS={mem_info.vms/1024/1024:.1f}MB"
                     )
-                    if torch.cuda.is_available():
+                    if cuda_available:
                         self.memory_logger.info(
                             f"CUDA Memory: "
                             f"Allocated={torch.cuda.memory_allocated()/1024/1024:.1f}MB, "
@@ -142,6 +159,12 @@ class DebugLogger:
                         )
                 except Exception as e:
                     print(f"Error in memory monitoring: {e}")
-                finally:
-                    threading.Event().wait(10)  # Log every 10 seconds
-        threading.Thread(target=log_memory, daemon=True, name="MemoryMonitor").start()
+                # Fixed-rate schedule; wait() returns early when stop is requested
+                next_run += interval
+                self._stop_event.wait(max(0.0, next_run - time.monotonic()))
+        self._memory_thread = threading.Thread(target=log_memory, daemon=True, name="MemoryMonitor")
+        self._memory_thread.start()
+    def stop_memory_monitoring(self, timeout: float = 1.0):
+        """Stop the memory monitor thread"""
+        self._stop_event.set()
+        self._memory_thread.join(timeout)
@@ -2,19 +2,66 @@
 Custom HOCR to PDF conversion utility that doesn't rely on ocrmypdf's HocrTransform
 This is a fallback implementation when the ocrmypdf.hocrtransform module has API changes
 """
+import hashlib
+import io
 import logging
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Tuple
-from lxml import etree, html
-from PIL import Image
-from reportlab.pdfgen.canvas import Canvas
-from reportlab.lib.units import inch
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.colors import Color
+from typing import TYPE_CHECKING, Iterable, List, Optional, Tuple
+from lxml import etree
+import numpy as np
+from utils.image_processor import get_image_meta
+# reportlab is imported where it is used; it is only needed on the fallback path
+if TYPE_CHECKING:
+    from reportlab.pdfgen.canvas import Canvas
 logger = logging.getLogger(__name__)
+_BBOX_RE = re.compile(r'bbox\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)')
+def _fast_bbox(title: str) -> Optional[Tuple[int, int, int, int]]:
+    """Parse a title of the form 'bbox x1 y1 x2 y2[; ...]' without regex; None otherwise"""
+    if title.startswith('bbox '):
+        parts = title.split(';', 1)[0].split()
+        if len(parts) == 5:
+            try:
+                return int(parts[1]), int(parts[2]), int(parts[3]), int(parts[4])
+            except ValueError:
+                pass
+    return None
+def _bbox_from_title(title: str) -> Optional[Tuple[int, int, int, int]]:
+    """Word titles normally start with the bbox; anything else goes through the regex"""
+    bbox = _fast_bbox(title)
+    if bbox:
+        return bbox
+    bbox_match = _BBOX_RE.search(title)
+    return bbox_match and tuple(map(int, bbox_match.groups()))
+def _bboxes_from_coords(coords: List[str]) -> Optional[np.ndarray]:
+    """Parse 'x1 y1 x2 y2' strings into an (N, 4) int32 array in one NumPy call; None if malformed"""
+    # The bulk parse only sees one flat list of numbers, so a title with three or
+    # five values would shift its neighbours' coordinates; reject those first
+    if any(len(c.split()) != 4 for c in coords):
+        return None
+    try:
+        boxes = np.fromstring(' '.join(coords), dtype=np.int32, sep=' ')
+    except ValueError:
+        return None
+    # NumPy stops at the first unparsable token, so malformed input comes back short
+    if boxes.size != 4 * len(coords):
+        return None
+    return boxes.reshape(-1, 4)
+# Compiled once; returns the word's full text content as a plain str
+_WORD_TEXT_XP = etree.XPath('string()', smart_strings=False)
+# Drops C0 control characters (except tab/LF/CR) that have no glyph in the text layer
+_PDF_TRANS = str.maketrans('', '', ''.join(chr(i) for i in range(32) if i not in (9, 10, 13)))
+_JPEG_MAGIC = b'\xff\xd8\xff'
+_JPEG_COLORSPACES = {1: 'DeviceGray', 3: 'DeviceRGB', 4: 'DeviceCMYK'}
+DEFAULT_DPI = 300
+def probe_image(image_path) -> Tuple[Tuple[int, int], int, Optional[str]]:
+    """Return ((width, height), dpi, format) for an image from the shared header cache"""
+    meta = get_image_meta(image_path)
+    dpi = meta['dpi']
+    dpi = int(round(dpi[0])) if dpi and dpi[0] > 0 else DEFAULT_DPI
+    return meta['size'], dpi, meta['format']
 class CustomHOCRTransform:
     """
     Custom implementation to convert HOCR files to searchable PDF
@@ -25,52 +72,109 @@ class CustomHOCRTransform:
         self.image_file = Path(image_file)
         self.dpi = dpi
         self.words = []
+        self.word_bboxes = np.empty((0, 4), dtype=np.int32)
         self.page_width = 0
         self.page_height = 0
-        # Load image to get dimensions
-        try:
-            with Image.open(self.image_file) as img:
-                self.image_width, self.image_height = img.size
-        except Exception as e:
-            logger.error(f"Failed to load image {self.image_file}: {e}")
-            self.image_width = self.image_height = 0
+        self._parsed = False
+        # Image dimensions are only needed when the HOCR has no page bbox
+        self.image_width = self.image_height = None
+    def _load_image_size(self):
+        """Read image dimensions from the file header without decoding pixels"""
+        if self.image_width is None:
+            try:
+                (self.image_width, self.image_height), _, _ = probe_image(self.image_file)
+            except Exception as e:
+                logger.error(f"Failed to load image {self.image_file}: {e}")
+                self.image_width = self.image_height = 0
+        return self.image_width, self.image_height
+    def _iter_pages(self, html: bool = False):
+        """
+        Stream the HOCR file and yield (page_bbox, words, coords) for each ocr_page
+        HOCR from DocTR/Tesseract is XHTML, so the faster XML parser is used unless
+        html is set; it raises XMLSyntaxError on markup that is not well-formed.
+        Words are assigned to the most recent page start, since DocTR writes the
+        ocr_page div empty with its blocks as siblings. coords holds each word's
+        'x1 y1 x2 y2' text, converted in bulk by the caller.
+        """
+        page_bbox = None
+        words, coords = [], []
+        seen_page = False
+        # iterparse keeps only the current subtree alive instead of the whole DOM
+        for event, elem in etree.iterparse(str(self.hocr_file), events=('start', 'end'),
+                                           tag=('{*}div', '{*}span'), html=html,
+                                           huge_tree=True, recover=html):
+            css_class = elem.get('class')
+            if event == 'start':
+                # Page bbox is on the opening tag, before any of its words
+                if css_class == 'ocr_page':
+                    if seen_page:
+                        yield page_bbox, words, coords
+                        words, coords = [], []
+                    seen_page = True
+                    page_bbox = self._parse_title(elem)
+                continue
+            if css_class == 'ocrx_word':
+                # Word spans normally hold their text directly; only nested
+                # markup needs the full string() evaluation
+                text = elem.text if len(elem) == 0 else _WORD_TEXT_XP(elem)
+                text = text.strip() if text else ''
+                if text:
+                    # Keep the bbox numbers as text and convert them all at once later
+                    title = elem.get('title', '')
+                    if title.startswith('bbox '):
+                        word_coords = title[5:].split(';', 1)[0]
+                    else:
+                        bbox = self._parse_title(elem)
+                        word_coords = bbox and '%d %d %d %d' % bbox
+                    if word_coords:
+                        words.append(text)
+                        coords.append(word_coords)
+            # Release the finished element and any already-processed siblings
+            elem.clear(keep_tail=True)
+            parent = elem.getparent()
+            if parent is not None:
+                while elem.getprevious() is not None:
+                    del parent[0]
+        if seen_page or words:
+            yield page_bbox, words, coords
     def _parse_hocr(self):
         """Parse HOCR file and extract word positions and text"""
+        if self._parsed:
+            return True
         try:
-            with open(self.hocr_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            # Parse HTML content
-            doc = html.fromstring(content)
-            # Find page dimensions
-            page_elem = doc.xpath('.//div[@class="ocr_page"]')[0]
-            bbox = self._parse_title(page_elem)
-            if bbox:
-                self.page_width = bbox[2] - bbox[0]
-                self.page_height = bbox[3] - bbox[1]
+            for html_mode in (False, True):
+                page_bbox = None
+                coords = []
+                self.words = []
+                try:
+                    for index, (bbox, words, page_coords) in enumerate(self._iter_pages(html_mode)):
+                        # The first page defines the PDF page size
+                        if index == 0:
+                            page_bbox = bbox
+                        self.words.extend(words)
+                        coords.extend(page_coords)
+                    break
+                except etree.XMLSyntaxError as e:
+                    if html_mode:
+                        raise
+                    logger.debug(f"HOCR is not well-formed XML, retrying with HTML parser: {e}")
+            if page_bbox:
+                self.page_width = page_bbox[2] - page_bbox[0]
+                self.page_height = page_bbox[3] - page_bbox[1]
             else:
                 # Fallback to image dimensions
-                self.page_width = self.image_width
-                self.page_height = self.image_height
-            # Extract all words
-            word_elements = doc.xpath('.//span[@class="ocrx_word"]')
-            for word_elem in word_elements:
-                bbox = self._parse_title(word_elem)
-                text = word_elem.text_content().strip()
-                if bbox and text:
-                    # Convert coordinates to PDF space
-                    x1, y1, x2, y2 = bbox
-                    # HOCR uses top-left origin, PDF uses bottom-left
-                    pdf_x1 = x1
-                    pdf_y1 = self.page_height - y2
-                    pdf_x2 = x2
-                    pdf_y2 = self.page_height - y1
-                    self.words.append({
-                        'text': text,
-                        'bbox': (pdf_x1, pdf_y1, pdf_x2, pdf_y2),
-                        'width': pdf_x2 - pdf_x1,
-                        'height': pdf_y2 - pdf_y1
-                    })
+                self.page_width, self.page_height = self._load_image_size()
+            # Raw HOCR bboxes (x1, y1, x2, y2), top-left origin, in pixels
+            if coords:
+                boxes = _bboxes_from_coords(coords)
+                if boxes is None:
+                    # Some title was malformed; parse word by word and drop the bad ones
+                    parsed = [_bbox_from_title('bbox ' + c) for c in coords]
+                    self.words = [w for w, bbox in zip(self.words, parsed) if bbox]
+                    boxes = np.asarray([bbox for bbox in parsed if bbox], dtype=np.int32).reshape(-1, 4)
+                self.word_bboxes = boxes
             logger.info(f"Parsed {len(self.words)} words from HOCR")
+            self._parsed = True
             return True
         except Exception as e:
             logger.error(f"Failed to parse HOCR file: {e}")
@@ -82,46 +186,107 @@ class CustomHOCRTransform:
         title = node.get('title', '')
         if not title:
             return None
-        # Look for bbox pattern
-        bbox_match = re.search(r'bbox\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)', title)
-        if bbox_match:
-            return tuple(map(int, bbox_match.groups()))
-        return None
+        return _bbox_from_title(title)
+    def _jpeg_xobject(self, name: str):
+        """Wrap a JPEG source as-is in a /DCTDecode XObject; None if it is not a usable JPEG"""
+        from reportlab.pdfbase import pdfdoc, pdfutils
+        with open(self.image_file, 'rb') as f:
+            data = f.read()
+        if not data.startswith(_JPEG_MAGIC):
+            return None
+        try:
+            img_width, img_height, components = pdfutils.readJPEGInfo(io.BytesIO(data))[:3]
+        except Exception:
+            return None
+        if components not in _JPEG_COLORSPACES:
+            return None
+        img = pdfdoc.PDFImageXObject(name)
+        img.width, img.height = img_width, img_height
+        img.bitsPerComponent = 8
+        img.colorSpace = _JPEG_COLORSPACES[components]
+        # Adobe CMYK JPEGs are stored inverted, same handling as reportlab
+        img._dotrans = components == 4
+        # Raw JPEG bytes, without the ASCII85 wrapping reportlab adds by default
+        img.streamContent = data
+        img._filters = ('DCTDecode',)
+        img.mask = None
+        return img
+    def _load_background(self):
+        """
+        Build the background image XObject without touching the canvas, so it can
+        be prepared on a worker thread while the HOCR is parsed. JPEG sources are
+        passed through untouched, other formats go through reportlab (decoded once).
+        """
+        from reportlab.pdfbase import pdfdoc
+        # Same name Canvas.drawImage derives for a file path with no mask
+        name = hashlib.md5(f"{self.image_file}None".encode('utf-8')).hexdigest()
+        img = self._jpeg_xobject(name)
+        if img is None:
+            img = pdfdoc.PDFImageXObject(name, str(self.image_file))
+        return img
+    @staticmethod
+    def _draw_background(c: "Canvas", img, width: float, height: float):
+        """Register and paint an image XObject the same way Canvas.drawImage does"""
+        reg_name = c._doc.getXObjectName(img.name)
+        c._setXObjects(img)
+        c._doc.Reference(img, reg_name)
+        c._doc.addForm(img.name, img)
+        c.saveState()
+        c.scale(width, height)
+        c._code.append(f"/{reg_name} Do")
+        c.restoreState()
+        c._formsinuse.append(img.name)
+        c._currentPageHasImages = 1
     def to_pdf(self, pdf_file: str) -> bool:
         """Convert HOCR to searchable PDF with invisible text layer"""
         try:
-            if not self._parse_hocr():
-                return False
-            # Calculate PDF page size based on DPI
-            pdf_width = (self.page_width / self.dpi) * inch
-            pdf_height = (self.page_height / self.dpi) * inch
-            # Create PDF canvas
-            c = Canvas(pdf_file, pagesize=(pdf_width, pdf_height))
-            # Draw the image as background
-            try:
-                c.drawImage(str(self.image_file), 0, 0,
-                           width=pdf_width, height=pdf_height)
-            except Exception as e:
-                logger.warning(f"Failed to embed image: {e}")
-            # Add invisible text layer
-            for word in self.words:
-                text = word['text']
-                bbox = word['bbox']
-                # Convert HOCR coordinates to PDF coordinates
-                x = (bbox[0] / self.dpi) * inch
-                y = (bbox[1] / self.dpi) * inch
-                width = (bbox[2] - bbox[0]) / self.dpi * inch
-                height = (bbox[3] - bbox[1]) / self.dpi * inch
-                # Calculate font size to fit the bbox
-                font_size = max(1, height * 0.8)  # 80% of bbox height
-                # Set text rendering mode to invisible (mode 3)
-                c.setFillColor(Color(0, 0, 0, alpha=0))  # Transparent
-                c.setFont("Helvetica", font_size)
-                # Add the text at the correct position
-                text_obj = c.beginText(x, y)
-                text_obj.setTextRenderMode(3)  # Invisible text
-                text_obj.textLine(text)
-                c.drawText(text_obj)
+            # A HOCR file describes a single page, so the useful overlap is decoding
+            # and compressing the background image while the HOCR is parsed; Pillow,
+            # zlib and libxml2 do most of that work outside the GIL
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                background = pool.submit(self._load_background)
+                if not self._parse_hocr():
+                    background.cancel()
+                    return False
+                from reportlab.lib.units import inch
+                from reportlab.pdfgen.canvas import Canvas
+                # Calculate PDF page size based on DPI
+                pdf_width = (self.page_width / self.dpi) * inch
+                pdf_height = (self.page_height / self.dpi) * inch
+                # Create PDF canvas; content streams are always zlib-compressed,
+                # whatever the local reportlab config says
+                c = Canvas(pdf_file, pagesize=(pdf_width, pdf_height), pageCompression=1)
+                # Draw the image as background
+                try:
+                    self._draw_background(c, background.result(), pdf_width, pdf_height)
+                except Exception as e:
+                    logger.warning(f"Failed to embed image: {e}")
+            # Convert HOCR pixel bboxes to PDF points in one pass;
+            # HOCR uses top-left origin, PDF uses bottom-left
+            scale = inch / self.dpi
+            boxes = self.word_bboxes
+            xs = (boxes[:, 0] * scale).tolist()
+            ys = ((self.page_height - boxes[:, 3]) * scale).tolist()
+            # Font size is 80% of the bbox height, snapped to a half-point grid so
+            # neighbouring words share a size and Tf is only emitted on change
+            font_sizes = np.maximum(1, (boxes[:, 3] - boxes[:, 1]) * scale * 0.8)
+            font_sizes = (np.round(font_sizes * 2) / 2).tolist()
+            # Write the invisible text layer straight into the page content stream
+            # as one BT/ET block; Helvetica uses WinAnsi (cp1252) encoding.
+            # Render mode 3 paints nothing, so no transparent fill state is needed
+            font_name = c._doc.getInternalFontName("Helvetica")
+            escape = c._escape
+            ops = []
+            current_size = None
+            # Words stay in HOCR reading order so text extraction order is preserved
+            for text, x, y, font_size in zip(self.words, xs, ys, font_sizes):
+                if font_size != current_size:
+                    ops.append(f"{font_name} {font_size:g} Tf")
+                    current_size = font_size
+                ops.append(f"1 0 0 1 {x:.2f} {y:.2f} Tm "
+                           f"({escape(text.translate(_PDF_TRANS).encode('cp1252', 'replace').decode('latin-1'))}) Tj")
+            if ops:
+                c._code.append("BT 3 Tr " + " ".join(ops) + " ET")
             # Save the PDF
             c.save()
             logger.info(f"Successfully created searchable PDF: {pdf_file}")
@@ -143,7 +308,11 @@ def convert_hocr_to_pdf(hocr_path: str, image_path: str, pdf_path: str, dpi: Opt
     """
     try:
         if dpi is None:
-            dpi = 300  # Default DPI
+            # Use the image's own DPI, falling back to the default
+            try:
+                _, dpi, _ = probe_image(image_path)
+            except Exception:
+                dpi = DEFAULT_DPI
         transformer = CustomHOCRTransform(hocr_path, image_path, dpi)
         return transformer.to_pdf(pdf_path)
     except Exception as e:
@@ -177,3 +346,29 @@ def hocr_to_pdf(hocr_path: str, image_path: str, pdf_path: str, dpi: Optional[in
     except Exception as e:
         logger.error(f"All HOCR to PDF conversion methods failed: {e}")
         return False
+def _hocr_to_pdf_job(job) -> bool:
+    """Run one (hocr_path, image_path, pdf_path[, dpi]) job; used by the batch pool"""
+    hocr_path, image_path, pdf_path, *rest = job
+    return hocr_to_pdf(hocr_path, image_path, pdf_path, rest[0] if rest else None)
+def hocr_to_pdf_batch(jobs: Iterable[Tuple], workers: Optional[int] = None) -> List[bool]:
+    """
+    Convert many HOCR/image pairs to PDF on a process pool
+    Args:
+        jobs: (hocr_path, image_path, pdf_path) or (hocr_path, image_path, pdf_path, dpi) tuples
+        workers: Number of worker processes (defaults to CPU count)
+    Returns:
+        List[bool]: Success flag for each job, in input order
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return []
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers > 1:
+        try:
+            # Small chunks keep the number of in-flight results bounded
+            chunksize = max(1, min(4, len(jobs) // workers))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(_hocr_to_pdf_job, jobs, chunksize=chunksize))
+        except Exception as e:
+            logger.error(f"Parallel HOCR to PDF conversion failed, running serially: {e}")
+    return [_hocr_to_pdf_job(job) for job in jobs]
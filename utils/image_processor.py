@@ -2,14 +2,27 @@ import os
 import sys
 import logging
 import threading
-import multiprocessing as mp
 import numpy as np
 from pathlib import Path
 import time
 import traceback
 from PIL import Image
 import tempfile
+from functools import lru_cache
 logger = logging.getLogger(__name__)
+@lru_cache(maxsize=512)
+def _read_image_meta(path, mtime_ns):
+    """Read size, mode, DPI and format from the image header; cached per (path, mtime)"""
+    with Image.open(path) as img:
+        return img.size, img.mode, img.info.get('dpi', (300, 300)), img.format
+def get_image_meta(image_path):
+    """
+    Return {'size', 'mode', 'dpi', 'format'} for an image without decoding pixels.
+    Each file version is only opened once however many pipeline stages ask.
+    """
+    path = os.fspath(image_path)
+    size, mode, dpi, fmt = _read_image_meta(path, os.stat(path).st_mtime_ns)
+    return {'size': size, 'mode': mode, 'dpi': dpi, 'format': fmt}
 class ImageProcessor(threading.Thread):
     """Process images in a separate thread/process"""
     def __init__(self, input_queue, output_queue):
@@ -21,17 +34,14 @@ class ImageProcessor(threading.Thread):
         """Main processing loop for the thread"""
         logger.debug("ImageProcessor thread started")
         try:
-            while not self._stop_event.is_set():
+            while True:
                 try:
-                    # Get next task with timeout to allow checking stop_event
-                    task = self.input_queue.get(timeout=0.5)
-                    if task is None:  # Shutdown signal
+                    # Block until work arrives; stop() enqueues a None sentinel to wake us
+                    task = self.input_queue.get()
+                    if task is None or self._stop_event.is_set():  # Shutdown signal
                         break
                     # Process image
                     self._process_task(task)
-                except mp.queues.Empty:
-                    # No tasks in queue, just continue and check stop_event
-                    continue
                 except Exception as e:
                     logger.error(f"Error in image processor thread: {e}")
                     # Don't exit loop on error, continue with next task
@@ -62,8 +72,8 @@ class ImageProcessor(threading.Thread):
                 bg = Image.new('RGB', img.size, (255, 255, 255))
                 if img.mode == 'P':
                     img = img.convert('RGBA')
-                # Paste using alpha channel as mask
-                bg.paste(img, mask=img.split()[3] if img.mode == 'RGBA' else img.split()[1])
+                # Paste using alpha channel as mask (extracts only the alpha band)
+                bg.paste(img, mask=img.getchannel('A'))
                 result_img = bg
             elif img.mode != 'RGB':
                 # Convert other modes to RGB
@@ -105,7 +115,10 @@ class ImageProcessor(threading.Thread):
             return None
     def stop(self):
         """Stop the processor thread"""
-        self._stop_event.set()
+        if not self._stop_event.is_set():
+            self._stop_event.set()
+            # Wake the blocking get() in run()
+            self.input_queue.put(None)
         logger.debug("Stop event set for ImageProcessor")
     @staticmethod
     def ensure_rgb_format(image_path, output_dir=None):
@@ -119,11 +132,10 @@ class ImageProcessor(threading.Thread):
                 output_dir = Path(tempfile.gettempdir()) / "VisionLaneOCR_temp"
                 output_dir.mkdir(exist_ok=True, parents=True)
             img_path = Path(image_path)
-            img = Image.open(img_path)
-            # Check if conversion needed
-            if img.mode == 'RGB':
-                img.close()
+            # Check if conversion needed from the header alone
+            if get_image_meta(img_path)['mode'] == 'RGB':
                 return img_path
+            img = Image.open(img_path)
             # Get DPI
             dpi = img.info.get('dpi', (300, 300))
             # Convert to RGB
@@ -132,7 +144,7 @@ class ImageProcessor(threading.Thread):
                 bg = Image.new('RGB', img.size, (255, 255, 255))
                 if img.mode == 'P':
                     img = img.convert('RGBA')
-                mask = img.split()[3] if img.mode == 'RGBA' else img.split()[1]
+                mask = img.getchannel('A')
                 bg.paste(img, mask=mask)
                 rgb_img = bg
             else:
@@ -2,6 +2,26 @@ import logging
 from pathlib import Path
 from datetime import datetime
 import os
+class BufferedFileHandler(logging.FileHandler):
+    """FileHandler that batches writes in a large buffer instead of flushing every record"""
+    def __init__(self, filename, encoding=None, buffer_size=1 << 20, flush_level=logging.WARNING):
+        self.buffer_size = buffer_size
+        self.flush_level = flush_level
+        super().__init__(filename, encoding=encoding)
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=self.buffer_size,
+                    encoding=self.encoding, errors=self.errors)
+    def flush(self):
+        # StreamHandler.emit flushes after every record; leave that to the buffer
+        pass
+    def emit(self, record):
+        super().emit(record)
+        # Warnings and errors should reach disk straight away
+        if record.levelno >= self.flush_level:
+            super().flush()
+    def close(self):
+        super().flush()
+        super().close()
 def setup_logging(base_dir: Path, startup_config=None):
     """Setup logging with optional startup configuration"""
     try:
@@ -11,8 +31,8 @@ def setup_logging(base_dir: Path, startup_config=None):
         # Create log filename with timestamp
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         log_file = logs_dir / f"ocr_process_{timestamp}.log"
-        # Create handlers with UTF-8 encoding
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        # Create handlers with UTF-8 encoding; the file handler buffers up to 1 MB
+        file_handler = BufferedFileHandler(log_file, encoding='utf-8')
         console_handler = logging.StreamHandler()
         # Create formatters with timezone
         formatter = logging.Formatter(
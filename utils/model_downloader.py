@@ -10,13 +10,44 @@ import requests
 from pathlib import Path
 from typing import Callable, Optional, Dict, Any
 import logging
+from functools import lru_cache
 from urllib.parse import urlparse
 logger = logging.getLogger(__name__)
+# Seconds between progress checks while a download runs
+PROGRESS_POLL_INTERVAL = 0.25
+# Give up waiting for a download after this many seconds
+DOWNLOAD_TIMEOUT = 120
+@lru_cache(maxsize=1)
+def _scan_cache_dir(cache_dir: str, mtime_ns: int) -> Dict[str, int]:
+    """Total size of the .pt weights in cache_dir per model name prefix"""
+    sizes = {}
+    try:
+        with os.scandir(cache_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.pt'):
+                    prefix = entry.name.split('-')[0]
+                    sizes[prefix] = sizes.get(prefix, 0) + entry.stat(follow_symlinks=False).st_size
+    except OSError:
+        pass
+    return sizes
 class ModelDownloadProgress:
     """Track model download progress with detailed updates"""
-    def __init__(self, progress_callback: Callable[[str], None] = None):
+    def __init__(self, progress_callback: Callable[[str], None] = None,
+                 cache_dir: Optional[Path] = None):
         self.progress_callback = progress_callback or (lambda x: print(x))
         self.download_stats = {}
+        # DocTR writes weights straight into its cache dir, so file growth there is real progress
+        self.cache_dir = cache_dir
+    def _downloaded_bytes(self, model_name: str) -> int:
+        """Bytes written so far to cache files for model_name"""
+        if not self.cache_dir:
+            return 0
+        try:
+            with os.scandir(self.cache_dir) as entries:
+                return sum(e.stat().st_size for e in entries
+                           if e.name.startswith(model_name) and e.is_file())
+        except OSError:
+            return 0
     def update_progress(self, message: str):
         """Update progress with message"""
         if self.progress_callback:
@@ -26,7 +57,7 @@ class ModelDownloadProgress:
         """Download a model with progress tracking"""
         try:
             self.update_progress(f"Initializing {model_name} download...")
-            # Start download in a separate thread to simulate progress
+            # Run the download in a worker thread so progress can be polled
             download_complete = threading.Event()
             download_error = None
             model_instance = None
@@ -41,32 +72,19 @@ class ModelDownloadProgress:
             # Start download thread
             download_thread = threading.Thread(target=download_worker)
             download_thread.start()
-            # Simulate progress updates while downloading
-            progress_phases = [
-                (f"Checking {model_name} availability...", 0.5),
-                (f"Connecting to model repository...", 1.0),
-                (f"Downloading {model_name} metadata...", 1.5),
-                (f"Downloading {model_name} weights (0%)...", 2.0),
-                (f"Downloading {model_name} weights (25%)...", 3.0),
-                (f"Downloading {model_name} weights (50%)...", 4.0),
-                (f"Downloading {model_name} weights (75%)...", 5.0),
-                (f"Downloading {model_name} weights (100%)...", 6.0),
-                (f"Verifying {model_name} integrity...", 1.0),
-                (f"Loading {model_name} into memory...", 1.0),
-                (f"Finalizing {model_name} setup...", 0.5),
-            ]
-            total_time = 0
-            for message, duration in progress_phases:
-                if download_complete.is_set():
+            # Report progress from the bytes actually written, only when it changes
+            self.update_progress(f"Downloading {model_name}...")
+            last_message = None
+            deadline = time.monotonic() + DOWNLOAD_TIMEOUT
+            while not download_complete.wait(PROGRESS_POLL_INTERVAL):
+                if time.monotonic() >= deadline:
                     break
-                self.update_progress(message)
-                time.sleep(duration)
-                total_time += duration
-                # Add some randomness to make it feel more realistic
-                if not download_complete.is_set() and total_time > 3:
-                    time.sleep(0.2)
-            # Wait for download to complete
-            download_thread.join(timeout=120)  # 2 minute timeout
+                downloaded = self._downloaded_bytes(model_name)
+                if downloaded:
+                    message = f"Downloading {model_name} weights ({downloaded / (1024 * 1024):.1f} MB)..."
+                    if message != last_message:
+                        self.update_progress(message)
+                        last_message = message
             if download_error:
                 self.update_progress(f"✗ Failed to download {model_name}")
                 raise download_error
@@ -83,13 +101,18 @@ class EnhancedModelManager:
     """Enhanced model management with caching and progress"""
     def __init__(self, progress_callback: Callable[[str], None] = None):
         self.progress_callback = progress_callback
-        self.downloader = ModelDownloadProgress(progress_callback)
         self.cache_dir = Path.home() / ".cache" / "doctr" / "models"
+        self.downloader = ModelDownloadProgress(progress_callback, self.cache_dir)
+    def _scan_cache(self) -> Dict[str, int]:
+        """Cached weights per model name, rescanned when the cache dir changes"""
+        try:
+            mtime_ns = self.cache_dir.stat().st_mtime_ns
+        except OSError:
+            return {}
+        return _scan_cache_dir(str(self.cache_dir), mtime_ns)
     def model_exists(self, model_name: str) -> bool:
         """Check if model exists in cache"""
-        if not self.cache_dir.exists():
-            return False
-        return any(p.name.split('-')[0] == model_name for p in self.cache_dir.glob("*.pt"))
+        return model_name in self._scan_cache()
     def download_model_if_needed(self, model_name: str, model_type: str) -> bool:
         """Download model if not already cached"""
         if self.model_exists(model_name):
@@ -109,23 +132,17 @@ class EnhancedModelManager:
                 self.progress_callback(f"✗ Failed to setup {model_name}")
             logger.error(f"Model setup error: {e}")
             return False
+        finally:
+            # New weights may have landed in the cache
+            _scan_cache_dir.cache_clear()
     def get_model_info(self, model_name: str) -> Dict[str, Any]:
         """Get information about a model"""
-        info = {
+        total_size = self._scan_cache().get(model_name)
+        return {
             'name': model_name,
-            'cached': self.model_exists(model_name),
-            'size': 'Unknown'
+            'cached': total_size is not None,
+            'size': self._format_bytes(total_size) if total_size is not None else 'Unknown'
         }
-        if info['cached']:
-            try:
-                # Try to estimate model file size
-                model_files = list(self.cache_dir.glob(f"{model_name}*.pt"))
-                if model_files:
-                    total_size = sum(f.stat().st_size for f in model_files)
-                    info['size'] = self._format_bytes(total_size)
-            except Exception:
-                pass
-        return info
     def _format_bytes(self, bytes_size: int) -> str:
         """Format bytes to human readable string"""
         for unit in ['B', 'KB', 'MB', 'GB']:
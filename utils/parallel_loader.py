@@ -3,13 +3,56 @@
 Parallel Loading System for VisionLane OCR
 Enables parallel loading of components for faster startup
 """
+import atexit
+import configparser
+import heapq
+import os
 import threading
 import queue
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed, Future
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, Future, wait
+from functools import lru_cache
+from pathlib import Path
 from typing import Callable, Dict, Any, List, Optional
 import logging
 logger = logging.getLogger(__name__)
+# Worker pools shared by every ParallelLoader, one per pool size, kept until exit
+_SHARED_POOLS: Dict[int, ThreadPoolExecutor] = {}
+_SHARED_POOLS_LOCK = threading.Lock()
+# How often load_parallel wakes to deliver progress queued by still-running tasks
+PROGRESS_POLL_INTERVAL = 0.1
+def _get_shared_pool(max_workers: int) -> ThreadPoolExecutor:
+    """Return the shared pool with max_workers threads, creating it on first use"""
+    with _SHARED_POOLS_LOCK:
+        pool = _SHARED_POOLS.get(max_workers)
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=max_workers,
+                                      thread_name_prefix="ParallelLoader")
+            _SHARED_POOLS[max_workers] = pool
+        return pool
+@atexit.register
+def _shutdown_shared_pools():
+    with _SHARED_POOLS_LOCK:
+        for pool in _SHARED_POOLS.values():
+            pool.shutdown(wait=False)
+        _SHARED_POOLS.clear()
+# Startup results that do not change within a process, shared by every StartupLoader
+_DEFAULT_CONFIG_PATH = Path(__file__).parent.parent / "config.ini"
+_cached_diagnostics = None
+@lru_cache(maxsize=4)
+def _read_startup_config(config_path: str, mtime_ns: int) -> Dict[str, Any]:
+    """Parse the startup settings from config_path; cached per (path, mtime)"""
+    config = configparser.ConfigParser()
+    # One read of the whole file; a missing config leaves the fallbacks in place
+    try:
+        config.read_string(Path(config_path).read_text(encoding="utf-8"), source=config_path)
+    except OSError:
+        pass
+    return {
+        'detection_model': config.get("General", "detection_model", fallback="db_resnet50"),
+        'recognition_model': config.get("General", "recognition_model", fallback="parseq"),
+        'thread_count': config.getint("Performance", "thread_count", fallback=4)
+    }
 class LoadingTask:
     """Represents a single loading task"""
     def __init__(self, name: str, func: Callable, priority: int = 0,
@@ -28,93 +71,152 @@ class ParallelLoader:
     def __init__(self, progress_callback: Callable[[str], None] = None,
                  max_workers: int = 4):
         self.progress_callback = progress_callback or (lambda x: print(x))
+        # Workers queue their progress messages; load_parallel delivers them on its own
+        # thread so the callback (often a GUI label) is never called from a worker.
+        # Task code gets queue_progress instead of the callback for the same reason
+        self._progress_q = queue.SimpleQueue()
         self.max_workers = max_workers
         self.tasks: Dict[str, LoadingTask] = {}
         self.completed_tasks: set = set()
+        # Only the load_parallel scheduler thread writes these, so no lock is needed
         self.failed_tasks: set = set()
-        self.task_lock = threading.Lock()
+    def queue_progress(self, message: str):
+        """Progress callback that is safe to call from any thread; load_parallel delivers it"""
+        self._progress_q.put(message)
     def add_task(self, name: str, func: Callable, priority: int = 0,
                  dependencies: List[str] = None, **kwargs):
         """Add a loading task"""
         task = LoadingTask(name, func, priority, dependencies, **kwargs)
         self.tasks[name] = task
-    def _can_start_task(self, task: LoadingTask) -> bool:
-        """Check if a task can start (dependencies met)"""
-        if task.started or task.completed:
-            return False
-        for dep in task.dependencies:
-            if dep not in self.completed_tasks:
+    def _build_schedule(self):
+        """
+        Build the dependency graph once: dependents of each task, the number of
+        unmet dependencies per pending task, each task's insertion order, and a
+        heap of the tasks ready now keyed on (-priority, order) so higher
+        priority runs first
+        """
+        dependents: Dict[str, List[str]] = {name: [] for name in self.tasks}
+        # A dependency on a task that was never added can not be met; fail now
+        # rather than leaving its dependents waiting until the timeout
+        unknown = {name: missing for name, task in self.tasks.items()
+                   if (missing := [dep for dep in task.dependencies if dep not in dependents])}
+        if unknown:
+            raise RuntimeError(f"Unsatisfiable task dependencies: {unknown}")
+        indegree: Dict[str, int] = {}
+        order = {name: i for i, name in enumerate(self.tasks)}
+        ready = []
+        for name, task in self.tasks.items():
+            if task.started or task.completed:
+                continue
+            unmet = [dep for dep in task.dependencies if dep not in self.completed_tasks]
+            for dep in unmet:
+                dependents[dep].append(name)
+            indegree[name] = len(unmet)
+            if not unmet:
+                heapq.heappush(ready, (-task.priority, order[name], name))
+        return dependents, indegree, order, ready
+    @staticmethod
+    def _is_chain(dependents: Dict[str, List[str]], indegree: Dict[str, int], ready: list) -> bool:
+        """True if no two pending tasks can ever be ready at the same time"""
+        remaining = dict(indegree)
+        frontier = [name for _, _, name in ready]
+        while frontier:
+            if len(frontier) > 1:
                 return False
+            for dependent in dependents[frontier.pop()]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    frontier.append(dependent)
         return True
-    def _get_ready_tasks(self) -> List[LoadingTask]:
-        """Get tasks that are ready to run"""
-        ready = []
-        for task in self.tasks.values():
-            if self._can_start_task(task):
-                ready.append(task)
-        # Sort by priority (higher first)
-        ready.sort(key=lambda t: t.priority, reverse=True)
-        return ready
     def _run_task(self, task: LoadingTask) -> LoadingTask:
         """Run a single task"""
         try:
-            with self.task_lock:
-                if task.started:
-                    return task
-                task.started = True
-            self.progress_callback(f"Loading {task.name}...")
-            # Run the task
-            if task.kwargs:
-                task.result = task.func(**task.kwargs)
-            else:
-                task.result = task.func()
+            # The scheduler submits each task exactly once and reports it as loading
+            task.started = True
+            # Run the task; kwargs is always a dict, empty when none were given
+            task.result = task.func(**task.kwargs)
             task.completed = True
-            with self.task_lock:
-                self.completed_tasks.add(task.name)
-            self.progress_callback(f"✓ {task.name} loaded")
+            self._progress_q.put(f"✓ {task.name} loaded")
         except Exception as e:
             task.error = e
             task.completed = True
-            with self.task_lock:
-                self.failed_tasks.add(task.name)
-            self.progress_callback(f"✗ Failed to load {task.name}")
+            self._progress_q.put(f"✗ Failed to load {task.name}")
             logger.error(f"Task {task.name} failed: {e}")
         return task
     def load_parallel(self, timeout: Optional[float] = None) -> Dict[str, Any]:
         """Load all tasks in parallel with dependency management"""
         start_time = time.time()
         results = {}
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            futures: Dict[Future, str] = {}
-            while len(self.completed_tasks) + len(self.failed_tasks) < len(self.tasks):
-                # Check for timeout
-                if timeout and (time.time() - start_time) > timeout:
+        dependents, indegree, order, ready = self._build_schedule()
+        def finish_task(task_name: str, task: LoadingTask):
+            if task.error:
+                self.failed_tasks.add(task_name)
+            elif task.completed:
+                self.completed_tasks.add(task_name)
+                results[task_name] = task.result
+                # Release dependents whose last dependency this was
+                for dependent in dependents[task_name]:
+                    indegree[dependent] -= 1
+                    if indegree[dependent] == 0:
+                        heapq.heappush(ready, (-self.tasks[dependent].priority,
+                                               order[dependent], dependent))
+        # Nothing could run concurrently anyway, so skip the pool handoffs and run in
+        # schedule order on this thread. A running task cannot be abandoned here, so a
+        # timeout still goes through the pool
+        if not timeout and (self.max_workers == 1 or self._is_chain(dependents, indegree, ready)):
+            while ready:
+                _, _, name = heapq.heappop(ready)
+                self.progress_callback(f"Loading {name}...")
+                finish_task(name, self._run_task(self.tasks[name]))
+                self._drain_progress()
+            return self._collect_results(results)
+        executor = _get_shared_pool(self.max_workers)
+        futures: Dict[Future, str] = {}
+        def submit_ready_tasks():
+            while ready:
+                _, _, name = heapq.heappop(ready)
+                self.progress_callback(f"Loading {name}...")
+                futures[executor.submit(self._run_task, self.tasks[name])] = name
+        submit_ready_tasks()
+        # Block until a task finishes, then submit whatever it unblocked. When nothing
+        # is in flight the remaining tasks wait on failed dependencies and never start
+        while futures:
+            wait_time = PROGRESS_POLL_INTERVAL
+            if timeout:
+                remaining = timeout - (time.time() - start_time)
+                if remaining <= 0:
                     self.progress_callback("⚠ Loading timeout reached")
+                    # The pool outlives this call, so drop tasks that have not started
+                    for future in futures:
+                        future.cancel()
                     break
-                # Get ready tasks
-                ready_tasks = self._get_ready_tasks()
-                # Submit ready tasks
-                for task in ready_tasks:
-                    if task.name not in [name for future, name in futures.items()]:
-                        future = executor.submit(self._run_task, task)
-                        futures[future] = task.name
-                # Check completed futures
-                completed_futures = []
-                for future in list(futures.keys()):
-                    if future.done():
-                        completed_futures.append(future)
-                # Process completed futures
-                for future in completed_futures:
-                    task_name = futures.pop(future)
-                    try:
-                        task = future.result()
-                        if task.completed and not task.error:
-                            results[task_name] = task.result
-                    except Exception as e:
-                        logger.error(f"Future error for {task_name}: {e}")
-                # Small delay to prevent busy waiting
-                if not completed_futures and not ready_tasks:
-                    time.sleep(0.1)
+                wait_time = min(wait_time, remaining)
+            # Wake periodically so progress from long-running tasks is not held back
+            done, _ = wait(futures, timeout=wait_time, return_when=FIRST_COMPLETED)
+            self._drain_progress()
+            # Process completed futures
+            for future in done:
+                task_name = futures.pop(future)
+                try:
+                    finish_task(task_name, future.result())
+                except Exception as e:
+                    logger.error(f"Future error for {task_name}: {e}")
+            submit_ready_tasks()
+        self._drain_progress()
+        return self._collect_results(results)
+    def _drain_progress(self):
+        """Deliver queued worker progress messages on the calling thread"""
+        while True:
+            try:
+                message = self._progress_q.get_nowait()
+            except queue.Empty:
+                break
+            self.progress_callback(message)
+    def _collect_results(self, results: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill in results for tasks that failed or never ran"""
+        skipped = [name for name, task in self.tasks.items() if not task.started]
+        if skipped:
+            logger.warning(f"Tasks not run because a dependency failed or timed out: {skipped}")
         # Collect results from failed tasks as well
         for task_name, task in self.tasks.items():
             if task_name not in results:
@@ -133,7 +235,8 @@ class StartupLoader:
     """High-level startup loader using parallel loading"""
     def __init__(self, progress_callback: Callable[[str], None] = None):
         self.progress_callback = progress_callback
-        self.loader = ParallelLoader(progress_callback, max_workers=3)
+        # One worker per independent task, so none of them queues behind another
+        self.loader = ParallelLoader(progress_callback, max_workers=4)
     def setup_loading_tasks(self, config_path=None):
         """Setup all startup loading tasks"""
         # Task 1: System diagnostics (no dependencies, high priority)
@@ -168,28 +271,38 @@ class StartupLoader:
             self._init_logging,
             priority=6
         )
+        # model_download only starts once DocTR is set up; import its module
+        # meanwhile so that cost is off the critical path
+        threading.Thread(target=self._warm_imports, name="StartupImportWarmer",
+                         daemon=True).start()
+    @staticmethod
+    def _warm_imports():
+        """Import modules of dependent tasks ahead of time"""
+        try:
+            import utils.model_downloader
+        except Exception as e:
+            logger.debug(f"Import warm-up failed: {e}")
     def _run_system_diagnostics(self):
-        """Run system diagnostics"""
-        from utils.system_diagnostics import SystemDiagnostics
-        diagnostics = SystemDiagnostics(self.progress_callback)
-        return diagnostics.run_diagnostics()
+        """Run system diagnostics, once per process"""
+        global _cached_diagnostics
+        if _cached_diagnostics is None:
+            from utils.system_diagnostics import SystemDiagnostics
+            diagnostics = SystemDiagnostics(self.loader.queue_progress)
+            _cached_diagnostics = diagnostics.run_diagnostics()
+        return _cached_diagnostics
     def _run_doctr_setup(self):
         """Run DocTR setup"""
         from core import doctr_torch_setup
-        return doctr_torch_setup.setup_doctr_with_progress(self.progress_callback)
+        return doctr_torch_setup.setup_doctr_with_progress(self.loader.queue_progress)
     def _load_config(self, config_path=None):
-        """Load configuration"""
-        import configparser
-        from pathlib import Path
-        config_path = config_path or Path(__file__).parent.parent / "config.ini"
-        config = configparser.ConfigParser()
-        if config_path and Path(config_path).exists():
-            config.read(config_path, encoding="utf-8")
-        return {
-            'detection_model': config.get("General", "detection_model", fallback="db_resnet50"),
-            'recognition_model': config.get("General", "recognition_model", fallback="parseq"),
-            'thread_count': config.getint("Performance", "thread_count", fallback=4)
-        }
+        """Load configuration, reparsing only when the file changes"""
+        config_path = os.fspath(config_path or _DEFAULT_CONFIG_PATH)
+        try:
+            mtime_ns = os.stat(config_path).st_mtime_ns
+        except OSError:
+            mtime_ns = 0
+        # Copy so callers cannot modify the cached settings
+        return dict(_read_startup_config(config_path, mtime_ns))
     def _download_models(self):
         """Download required models"""
         from utils.model_downloader import EnhancedModelManager
@@ -202,11 +315,15 @@ class StartupLoader:
         else:
             det_model = 'db_resnet50'
             rec_model = 'parseq'
-        manager = EnhancedModelManager(self.progress_callback)
-        results = {}
-        results['detection'] = manager.download_model_if_needed(det_model, "detection")
-        results['recognition'] = manager.download_model_if_needed(rec_model, "recognition")
-        return results
+        manager = EnhancedModelManager(self.loader.queue_progress)
+        # The two downloads are independent and network bound, so fetch them together
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            detection = executor.submit(manager.download_model_if_needed, det_model, "detection")
+            recognition = executor.submit(manager.download_model_if_needed, rec_model, "recognition")
+            return {
+                'detection': detection.result(),
+                'recognition': recognition.result()
+            }
     def _init_logging(self):
         """Initialize logging system"""
         import logging
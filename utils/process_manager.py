@@ -2,61 +2,82 @@ import os
 import signal
 import psutil
 import threading
+import time
+import weakref
 import logging
-from typing import Set
+from typing import Dict, Optional
 logger = logging.getLogger(__name__)
 class ProcessManager:
     def __init__(self):
-        self.processes: Set[int] = set()
-        self.threads: Set[threading.Thread] = set()
+        # psutil handles are created once at track time and reused on shutdown
+        self.processes: Dict[int, psutil.Process] = {}
+        # Tracked threads and the event each one watches to stop cooperatively.
+        # Weakly keyed: a running thread is kept alive by threading itself, and
+        # finished ones drop out instead of being pinned here
+        self.threads: Dict[threading.Thread, Optional[threading.Event]] = weakref.WeakKeyDictionary()
         self.main_pid = os.getpid()
         self._lock = threading.Lock()
-    def track_thread(self, thread: threading.Thread):
-        """Track thread for cleanup and ensure it's set as daemon"""
+    def track_thread(self, thread: threading.Thread, stop_event: Optional[threading.Event] = None):
+        """
+        Track thread for cleanup and ensure it's set as daemon.
+        If the thread watches stop_event, force_exit sets it and waits briefly for the thread to finish.
+        """
         # Ensure thread is daemon to prevent hanging on exit
         if not thread.daemon:
             thread.daemon = True
         with self._lock:
-            self.threads.add(thread)
+            self.threads[thread] = stop_event
     def track_process(self, pid: int):
         """Track process for cleanup"""
+        try:
+            proc = psutil.Process(pid)
+        except psutil.Error:
+            return
         with self._lock:
-            self.processes.add(pid)
+            self.processes[pid] = proc
     def force_exit(self):
         """Force kill all tracked processes and threads"""
-        # Stop threads first
+        # Ask cooperative threads to stop first; the rest are daemons and end with the interpreter
         with self._lock:
-            for thread in list(self.threads):
-                try:
-                    if thread.is_alive():
-                        thread_name = thread.name.lower()
-                        if not any(x in thread_name for x in ['watch', 'monitor', 'event', 'qt']):
-                            thread._stop()
-                except:
-                    pass
+            stopping = []
+            for thread, stop_event in list(self.threads.items()):
+                if stop_event is not None and thread.is_alive():
+                    stop_event.set()
+                    stopping.append(thread)
             self.threads.clear()
+        # All threads were signalled together, so share one short deadline across the joins
+        deadline = time.monotonic() + 0.5
+        current = threading.current_thread()
+        for thread in stopping:
+            if thread is not current:
+                thread.join(max(0.0, deadline - time.monotonic()))
         # Force kill processes and their children
         with self._lock:
-            for pid in list(self.processes):
-                try:
-                    if pid != self.main_pid and psutil.pid_exists(pid):
-                        proc = psutil.Process(pid)
-                        for child in proc.children(recursive=True):
-                            try:
-                                child.kill()  # Use kill() instead of terminate()
-                            except:
-                                pass
-                        proc.kill()  # Use kill() instead of terminate()
-                except:
-                    continue
-            # Double check and force kill any remaining processes
-            for pid in list(self.processes):
-                try:
-                    if pid != self.main_pid and psutil.pid_exists(pid):
-                        os.kill(pid, signal.SIGKILL)
-                except:
-                    pass
+            procs = [proc for pid, proc in self.processes.items() if pid != self.main_pid]
             self.processes.clear()
+        # Collect every victim in one pass, children before their parent.
+        # is_running also guards against the pid having been reused since tracking
+        victims = []
+        for proc in procs:
+            try:
+                if not proc.is_running():
+                    continue
+                victims.extend(proc.children(recursive=True))
+                victims.append(proc)
+            except psutil.Error:
+                continue
+        for proc in victims:
+            try:
+                proc.kill()  # Use kill() instead of terminate()
+            except psutil.Error:
+                pass
+        # Reap them together; only the ones still alive get a raw SIGKILL
+        _, alive = psutil.wait_procs(victims, timeout=0.5)
+        for proc in alive:
+            try:
+                os.kill(proc.pid, signal.SIGKILL)
+            except Exception:
+                pass
         logger.debug("Force exit completed")
     def is_running(self) -> bool:
         """Check if any processes or threads are still running"""
@@ -1,13 +1,20 @@
 #!/usr/bin/env python3
 import os
+import re
+import sys
 import argparse
+import shlex
 import subprocess
 from datetime import datetime, timezone
 import time
 from tqdm import tqdm
 import logging
-import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging.handlers
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from functools import lru_cache
+from itertools import chain, islice
+from pathlib import Path
 import psutil
 import shutil
 # Set up logging with more detailed format
@@ -17,24 +24,332 @@ logging.basicConfig(
     datefmt="%Y-%m-%d %H:%M:%S",
 )
 logger = logging.getLogger(__name__)
+# Most files handed to one Ghostscript process by compress_pdf_batch; keeps the
+# command line well under the Windows 32 KB limit
+GS_BATCH_SIZE = 32
+_MB = 1 << 20
+# Rough peak memory of one pdfwrite Ghostscript process on image-heavy PDFs; caps
+# the worker count on machines with little free RAM
+GS_WORKER_MEMORY = 400 * _MB
+# PDFs smaller than this are copied as-is; Ghostscript rarely shrinks them and
+# its startup would cost more than it saves
+MIN_COMPRESSIBLE_MB = 0.2
+# Images are only downsampled when their resolution exceeds the target by this factor,
+# so borderline images are not recompressed for little gain
+DOWNSAMPLE_THRESHOLD = 1.1
+# Only the end of Ghostscript's error output is logged when a run fails
+GS_STDERR_TAIL = 4096
+# Ghostscript arguments that do not depend on the file or settings; anything it
+# prints to stdout goes to stderr, the only stream kept
+_GS_BASE_ARGS = ('-sDEVICE=pdfwrite', '-dNOPAUSE', '-dQUIET', '-dBATCH', '-dSAFER', '-sstdout=%stderr')
+# subprocess.run arguments shared by every Ghostscript call; no console window on Windows
+_GS_RUN_KWARGS = dict(
+    stdout=subprocess.DEVNULL,
+    stderr=subprocess.PIPE
+)
+if sys.platform.startswith("win"):
+    _GS_RUN_KWARGS["creationflags"] = getattr(subprocess, "CREATE_NO_WINDOW", 0x08000000)
+# Version number in a Ghostscript install directory name, e.g. "gs10.03.1"
+_GS_VERSION_RE = re.compile(r'(\d+(\.\d+)*)')
+@lru_cache(maxsize=1)
+def _find_ghostscript():
+    """Return the path of the Ghostscript executable, or None if it is not installed; looked up once per process"""
+    if sys.platform.startswith("win"):
+        exe_name = "gswin64c.exe"
+        # 1. Check PATH
+        gs_path = shutil.which(exe_name)
+        if not gs_path:
+            # 2. Search in Program Files locations
+            search_dirs = [
+                Path("C:/Program Files/gs"),
+                Path("C:/Program Files (x86)/gs"),
+            ]
+            found = []
+            for base in search_dirs:
+                if base.exists():
+                    for sub in base.iterdir():
+                        if sub.is_dir():
+                            exe = sub / "bin" / exe_name
+                            if exe.exists():
+                                m = _GS_VERSION_RE.search(sub.name)
+                                version = tuple(map(int, m.group(1).split('.'))) if m else (0,)
+                                found.append((version, exe))
+            if found:
+                found.sort(reverse=True)
+                gs_path = str(found[0][1])
+        return gs_path
+    return shutil.which("gs")
+@lru_cache(maxsize=1)
+def _cpu_count() -> int:
+    """Physical core count, read once per process; each Ghostscript process is single-threaded and CPU-bound"""
+    return psutil.cpu_count(logical=False) or max(1, (os.cpu_count() or 1) // 2)
+def _init_worker_logging(log_queue):
+    """Send a pool worker's log records to the parent process, which writes them all"""
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+def _clone_file(src: str, dst: str):
+    """
+    Copy src over dst, letting the kernel do the copy where it can (reflink on
+    btrfs/xfs, server-side copy on NFS) and falling back to shutil.copy2.
+    """
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            if remaining == 0:
+                shutil.copystat(src, dst)
+                return
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+def _stderr_tail(stderr: bytes) -> str:
+    """Decode the end of Ghostscript's error output; it is kept as bytes until needed"""
+    return stderr[-GS_STDERR_TAIL:].decode("utf-8", "replace")
+def _ps_string(text: str) -> str:
+    """Quote text as a PostScript string literal"""
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
 class PDFProcessor:
     def __init__(self):
         self.start_time = datetime.now(timezone.utc)
         self.user = os.getlogin()
     def get_max_threads(self):
         """Get the maximum number of threads available on the system"""
-        return psutil.cpu_count(logical=True)
+        return _cpu_count()
     def log_with_timestamp(
         self, message: str, level: str = "info", thread_name: str = None
     ):
-        """Log message with current UTC timestamp using timezone-aware datetime"""
-        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+        """Log message; the timestamp and thread name come from the logging format"""
         thread_info = f"[{thread_name}] " if thread_name else ""
         if level.lower() == "error":
-            logger.error(f"{timestamp} - {thread_info}{message}")
+            logger.error(f"{thread_info}{message}")
+        else:
+            logger.info(f"{thread_info}{message}")
+    def _gs_options(self, initial_size_mb: float, quality: int, compression_type: str,
+                    downsample_threshold: float = DOWNSAMPLE_THRESHOLD) -> tuple:
+        """Ghostscript arguments for a file of this size, quality and compression type (no paths)"""
+        return self._gs_flags(initial_size_mb >= 1.0, quality, (compression_type or "jpeg").lower(),
+                              downsample_threshold)
+    @staticmethod
+    @lru_cache(maxsize=32)
+    def _gs_flags(large_file: bool, quality: int, compression_type: str, downsample_threshold: float) -> tuple:
+        """
+        Ghostscript arguments for one combination of settings. Only a handful of
+        combinations occur in a run, so each is built once and reused.
+        """
+        if quality >= 90:
+            # Near-lossless quality: effectively disable downsampling
+            downsample_threshold = max(downsample_threshold, 10.0)
+        # For very small PDFs (< 1MB), be more conservative
+        if not large_file:
+            # Small PDFs - use gentler settings to avoid bloat
+            compression_level = max(0, min(9, int((100 - quality) / 20)))  # Less aggressive
+            resolution = 300 if quality > 50 else 150  # Keep reasonable resolution
+            jpeg_quality = max(70, min(100, quality + 20))  # Higher JPEG quality
+        else:
+            # Larger PDFs - standard compression settings
+            compression_level = max(0, min(9, int((100 - quality) / 11)))  # 0-9 compression level
+            # Set downsampling resolution based on quality
+            if quality <= 30:
+                resolution = 72  # Low quality - aggressive compression
+            elif quality <= 60:
+                resolution = 150  # Medium quality
+            elif quality <= 85:
+                resolution = 300  # High quality
+            else:
+                resolution = 600  # Very high quality - minimal compression
+            # Adjust JPEG quality based on input quality
+            jpeg_quality = max(5, min(100, quality))  # Never go below 5% JPEG quality
+        # --- IMPROVED: Set different parameters for each compression type ---            # Build GhostScript command with optimized parameters
+        # Options are keyed by name so each is passed to Ghostscript once
+        opts = {}
+        def add(*flags):
+            for flag in flags:
+                name, sep, value = flag.partition('=')
+                opts[name] = value if sep else None
+        # For small PDFs, use more conservative settings
+        if not large_file:
+            add(
+                '-dPDFSETTINGS=/ebook',  # Conservative preset for small files
+                '-dCompatibilityLevel=1.4',
+                '-dCompressFonts=true',
+                '-dSubsetFonts=true',
+                '-dCompressStreams=false',  # Don't compress streams for small files
+                '-dAutoRotatePages=/None',
+                '-dPreserveStructure=true',
+                '-dDetectDuplicateImages=true',  # Store repeated images once
+                '-dOptimize=true',
+            )
+        else:
+            add(
+                '-dCompatibilityLevel=1.5',  # Use PDF 1.5 compatibility for better compression
+                '-dPDFSETTINGS=/default',    # Base settings
+                '-dPrinted=false',           # Not for printing
+                '-dCompressFonts=true',
+                '-dCompressPages=true',
+                '-dCompressStreams=true',    # Force stream compression
+                '-dAutoRotatePages=/None',   # Preserve orientation
+                '-dPreserveStructure=true',  # Preserve document structure
+                '-dEmbedAllFonts=true',      # Keep all fonts
+                '-dSubsetFonts=true',        # But subset them to reduce size
+                f'-dCompressLevel={compression_level}',  # Compression level for non-image objects
+                '-dDetectDuplicateImages=true',  # Store repeated images (logos, backgrounds) once
+                '-dOptimize=true',
+            )
+        if quality < 85:
+            # Drop metadata that only matters for print workflows
+            add(
+                '-dPreserveMarkedContent=false',
+                '-dPreserveEPSInfo=false',
+                '-dPreserveOPIComments=false',
+                '-dPreserveHalftoneInfo=false',
+            )
+          # --- IMPROVED: Set image sampling based on quality (only for larger PDFs) ---
+        if large_file:  # Only apply aggressive image compression to larger files
+            # Color image settings
+            add(
+                f'-dColorImageDownsampleType=/Bicubic',
+                f'-dColorImageResolution={resolution}',
+                f'-dDownsampleColorImages=true',
+                f'-dColorImageDownsampleThreshold={downsample_threshold}',  # Downsample color images
+                f'-dEncodeColorImages=true',
+            )
+            # Grayscale image settings
+            add(
+                f'-dGrayImageDownsampleType=/Bicubic',
+                f'-dGrayImageResolution={resolution}',
+                f'-dDownsampleGrayImages=true',
+                f'-dGrayImageDownsampleThreshold={downsample_threshold}',  # Downsample grayscale images
+                f'-dEncodeGrayImages=true',
+            )
+            # Monochrome image settings
+            add(
+                f'-dMonoImageDownsampleType=/Bicubic',
+                f'-dMonoImageResolution={resolution}',
+                f'-dDownsampleMonoImages=true',
+                f'-dMonoImageDownsampleThreshold={downsample_threshold}',  # Downsample monochrome images
+            )
+        else:            # For small PDFs, preserve image quality
+            add(
+                f'-dDownsampleColorImages=false',
+                f'-dDownsampleGrayImages=false',
+                f'-dDownsampleMonoImages=false',
+            )
+          # --- IMPROVED: Handle specific compression type settings (only for larger PDFs) ---
+        ctype = compression_type
+        if large_file:  # Only apply specific compression to larger files
+            if ctype == "jpeg":
+                add(
+                    f'-dAutoFilterColorImages=false',
+                    f'-dColorImageFilter=/DCTEncode',
+                    f'-dAutoFilterGrayImages=false',
+                    f'-dGrayImageFilter=/DCTEncode',
+                    f'-dJPEGQ={jpeg_quality}',
+                    # Color bit depth based on quality
+                    f'-dColorConversionStrategy=/LeaveColorUnchanged',
+                    f'-dColorImageDepth={8 if quality < 85 else 24}',
+                )
+            elif ctype == "jpeg2000":
+                add(
+                    f'-dAutoFilterColorImages=false',
+                    f'-dColorImageFilter=/JPXEncode',
+                    f'-dAutoFilterGrayImages=false',
+                    f'-dGrayImageFilter=/JPXEncode',
+                    # Quality parameters specific to JPEG2000
+                    f'-dJPEGQ={jpeg_quality}',
+                    # Set color depth based on quality
+                    f'-dColorConversionStrategy=/LeaveColorUnchanged',
+                    f'-dColorImageDepth={8 if quality < 85 else 24}',
+                )
+            elif ctype == "lzw":
+                add(
+                    f'-dAutoFilterColorImages=false',
+                    f'-dColorImageFilter=/LZWEncode',
+                    f'-dAutoFilterGrayImages=false',
+                    f'-dGrayImageFilter=/LZWEncode',
+                    # LZW predictor to improve compression
+                    f'-dLZWPredictor=2',
+                    f'-dColorConversionStrategy=/LeaveColorUnchanged',
+                )
+            elif ctype == "png" or ctype == "flate":
+                add(
+                    f'-dAutoFilterColorImages=false',
+                    f'-dColorImageFilter=/FlateEncode',
+                    f'-dAutoFilterGrayImages=false',
+                    f'-dGrayImageFilter=/FlateEncode',
+                    # Set flate predictor for better lossless compression
+                    f'-dFlatePrediction=2',
+                    f'-dColorConversionStrategy=/LeaveColorUnchanged',
+                )
+            else:
+                # Default to JPEG
+                add(
+                    f'-dAutoFilterColorImages=false',
+                    f'-dColorImageFilter=/DCTEncode',
+                    f'-dAutoFilterGrayImages=false',
+                    f'-dGrayImageFilter=/DCTEncode',
+                    f'-dJPEGQ={jpeg_quality}',
+                )
+        # --- IMPROVED: Add PDFSETTINGS presets for better compression ---
+        # Override default settings with quality-based presets if quality is at extremes
+        if quality < 30:
+            # Low quality: aggressive compression
+            add('-dPDFSETTINGS=/ebook')
+        elif quality > 90:
+            # Very high quality: minimal compression
+            add('-dPDFSETTINGS=/prepress')
+        return _GS_BASE_ARGS + tuple(
+            f"{name}={value}" if value is not None else name for name, value in opts.items()
+        )
+    def _check_output(self, input_path: str, output_path: str, initial_size_mb: float,
+                      start_time: float = None) -> bool:
+        """
+        Report the result of a successful Ghostscript run and keep the original if it grew.
+        Without start_time (files of a batched run) no per-file time is reported.
+        """
+        final_size_mb = os.path.getsize(output_path) / _MB
+        compression_ratio = (1 - final_size_mb/initial_size_mb) * 100
+        # One record per file, formatted only if it is emitted
+        if start_time is None:
+            logger.info(
+                "\nCompression Results for %s:\n- Initial size: %.2fMB\n- Final size: %.2fMB"
+                "\n- Compression ratio: %.2f%%",
+                os.path.basename(input_path), initial_size_mb, final_size_mb, compression_ratio
+            )
         else:
-            logger.info(f"{timestamp} - {thread_info}{message}")
-    def compress_pdf(self, input_path: str, output_path: str, quality: int = 50, fast_mode: bool = True, compression_type: str = "jpeg") -> bool:
+            logger.info(
+                "\nCompression Results for %s:\n- Initial size: %.2fMB\n- Final size: %.2fMB"
+                "\n- Compression ratio: %.2f%%\n- Processing time: %.2fs",
+                os.path.basename(input_path), initial_size_mb, final_size_mb, compression_ratio,
+                time.time() - start_time
+            )
+          # If compression actually made the file larger, use the original
+        # But be more lenient for small files (< 5% increase is acceptable)
+        size_increase_threshold = 0.05 if initial_size_mb < 2.0 else 0.0
+        if final_size_mb > initial_size_mb * (1 + size_increase_threshold):
+            self.log_with_timestamp(
+                f"Compression increased file size significantly, reverting to original."
+            )
+            # Not hardlinked: callers may later overwrite the input with the output
+            _clone_file(input_path, output_path)
+            return True
+        elif final_size_mb > initial_size_mb:
+            self.log_with_timestamp(
+                f"Compression slightly increased file size but within acceptable threshold."
+            )
+        return True
+    def _copy_uncompressed(self, input_path: str, output_path: str) -> bool:
+        """Copy a PDF that is too small to be worth compressing"""
+        logger.info("Skipped %s: below compression threshold", os.path.basename(input_path))
+        if os.path.abspath(input_path) != os.path.abspath(output_path):
+            _clone_file(input_path, output_path)
+        return True
+    def compress_pdf(self, input_path: str, output_path: str, quality: int = 50, fast_mode: bool = True, compression_type: str = "jpeg",
+                     downsample_threshold: float = DOWNSAMPLE_THRESHOLD) -> bool:
         """Compress a single PDF file using Ghostscript."""
         try:
             # Convert to absolute paths
@@ -44,346 +359,241 @@ class PDFProcessor:
                 self.log_with_timestamp(f"Input file not found: {input_path}", "error")
                 return False
             start_time = time.time()
-            thread_name = f"Thread-{threading.current_thread().ident}"
-            self.log_with_timestamp(f"Processing file: {input_path}", thread_name=thread_name)
+            logger.info("Processing file: %s", input_path)
             # Create output directory if it doesn't exist
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            # --- Check if compression is likely to be beneficial ---
+            initial_size_mb = os.path.getsize(input_path) / _MB
+            if initial_size_mb < MIN_COMPRESSIBLE_MB:
+                return self._copy_uncompressed(input_path, output_path)
             # --- Find Ghostscript executable ---
-            import sys
-            if sys.platform.startswith("win"):
-                exe_name = "gswin64c.exe"
-                gs_path = None
-                # 1. Check PATH
-                gs_path = shutil.which(exe_name)
-                if not gs_path:
-                    # 2. Search in Program Files locations
-                    import re
-                    from pathlib import Path
-                    search_dirs = [
-                        Path("C:/Program Files/gs"),
-                        Path("C:/Program Files (x86)/gs"),
-                    ]
-                    found = []
-                    for base in search_dirs:
-                        if base.exists():
-                            for sub in base.iterdir():
-                                if sub.is_dir():
-                                    exe = sub / "bin" / exe_name
-                                    if exe.exists():
-                                        m = re.search(r'(\d+(\.\d+)*)', sub.name)
-                                        version = tuple(map(int, m.group(1).split('.'))) if m else (0,)
-                                        found.append((version, exe))
-                    if found:
-                        found.sort(reverse=True)
-                        gs_path = str(found[0][1])
-                if not gs_path:
-                    self.log_with_timestamp("Ghostscript not found! PDF compression will not run.", "error")
-                    return False
-            else:
-                exe_name = "gs"
-                gs_path = shutil.which(exe_name)
-                if not gs_path:
-                    self.log_with_timestamp("Ghostscript not found! PDF compression will not run.", "error")
-                    return False            # --- Check if compression is likely to be beneficial ---
-            initial_size_mb = os.path.getsize(input_path) / (1024 * 1024)
-            # For very small PDFs (< 1MB), be more conservative
-            if initial_size_mb < 1.0:
-                # Small PDFs - use gentler settings to avoid bloat
-                compression_level = max(0, min(9, int((100 - quality) / 20)))  # Less aggressive
-                resolution = 300 if quality > 50 else 150  # Keep reasonable resolution
-                jpeg_quality = max(70, min(100, quality + 20))  # Higher JPEG quality
-            else:
-                # Larger PDFs - standard compression settings
-                compression_level = max(0, min(9, int((100 - quality) / 11)))  # 0-9 compression level
-                # Set downsampling resolution based on quality
-                if quality <= 30:
-                    resolution = 72  # Low quality - aggressive compression
-                elif quality <= 60:
-                    resolution = 150  # Medium quality
-                elif quality <= 85:
-                    resolution = 300  # High quality
-                else:
-                    resolution = 600  # Very high quality - minimal compression
-                # Adjust JPEG quality based on input quality
-                jpeg_quality = max(5, min(100, quality))  # Never go below 5% JPEG quality
-            # --- IMPROVED: Set different parameters for each compression type ---            # Build GhostScript command with optimized parameters
-            gs_cmd = [
-                f'"{gs_path}"',
-                '-sDEVICE=pdfwrite',
-                '-dNOPAUSE',
-                '-dQUIET',
-                '-dBATCH',
-                '-dSAFER',
-            ]
-            # For small PDFs, use more conservative settings
-            if initial_size_mb < 1.0:
-                gs_cmd.extend([
-                    '-dPDFSETTINGS=/ebook',  # Conservative preset for small files
-                    '-dCompatibilityLevel=1.4',
-                    '-dCompressFonts=true',
-                    '-dSubsetFonts=true',
-                    '-dCompressStreams=false',  # Don't compress streams for small files
-                    '-dAutoRotatePages=/None',
-                    '-dPreserveStructure=true',
-                ])
-            else:
-                gs_cmd.extend([
-                    '-dCompatibilityLevel=1.5',  # Use PDF 1.5 compatibility for better compression
-                    '-dPDFSETTINGS=/default',    # Base settings
-                    '-dPrinted=false',           # Not for printing
-                    '-dCompressFonts=true',
-                    '-dCompressPages=true',
-                    '-dCompressStreams=true',    # Force stream compression
-                    '-dAutoRotatePages=/None',   # Preserve orientation
-                    '-dPreserveStructure=true',  # Preserve document structure
-                    '-dCompatibilityLevel=1.5',  # PDF 1.5 compatibility
-                    '-dEmbedAllFonts=true',      # Keep all fonts
-                    '-dSubsetFonts=true',        # But subset them to reduce size
-                    f'-dCompressLevel={compression_level}',  # Compression level for non-image objects
-                ])
-              # --- IMPROVED: Set image sampling based on quality (only for larger PDFs) ---
-            if initial_size_mb >= 1.0:  # Only apply aggressive image compression to larger files
-                # Color image settings
-                gs_cmd.extend([
-                    f'-dColorImageDownsampleType=/Bicubic',
-                    f'-dColorImageResolution={resolution}',
-                    f'-dDownsampleColorImages=true',
-                    f'-dColorImageDownsampleThreshold=1.0',  # Always downsample color images
-                    f'-dEncodeColorImages=true',
-                ])
-                # Grayscale image settings
-                gs_cmd.extend([
-                    f'-dGrayImageDownsampleType=/Bicubic',
-                    f'-dGrayImageResolution={resolution}',
-                    f'-dDownsampleGrayImages=true',
-                    f'-dGrayImageDownsampleThreshold=1.0',  # Always downsample grayscale images
-                    f'-dEncodeGrayImages=true',
-                ])
-                # Monochrome image settings
-                gs_cmd.extend([
-                    f'-dMonoImageDownsampleType=/Bicubic',
-                    f'-dMonoImageResolution={resolution}',
-                    f'-dDownsampleMonoImages=true',
-                    f'-dMonoImageDownsampleThreshold=1.0',  # Always downsample monochrome images
-                ])
-            else:            # For small PDFs, preserve image quality
-                gs_cmd.extend([
-                    f'-dDownsampleColorImages=false',
-                    f'-dDownsampleGrayImages=false',
-                    f'-dDownsampleMonoImages=false',
-                ])
-              # --- IMPROVED: Handle specific compression type settings (only for larger PDFs) ---
-            ctype = (compression_type or "jpeg").lower()
-            if initial_size_mb >= 1.0:  # Only apply specific compression to larger files
-                if ctype == "jpeg":
-                    gs_cmd.extend([
-                        f'-dAutoFilterColorImages=false',
-                        f'-dColorImageFilter=/DCTEncode',
-                        f'-dAutoFilterGrayImages=false',
-                        f'-dGrayImageFilter=/DCTEncode',
-                        f'-dJPEGQ={jpeg_quality}',
-                        # Color bit depth based on quality
-                        f'-dColorConversionStrategy=/LeaveColorUnchanged',
-                        f'-dColorImageDepth={8 if quality < 85 else 24}',
-                    ])
-                elif ctype == "jpeg2000":
-                    gs_cmd.extend([
-                        f'-dAutoFilterColorImages=false',
-                        f'-dColorImageFilter=/JPXEncode',
-                        f'-dAutoFilterGrayImages=false',
-                        f'-dGrayImageFilter=/JPXEncode',
-                        # Quality parameters specific to JPEG2000
-                        f'-dJPEGQ={jpeg_quality}',
-                        # Set color depth based on quality
-                        f'-dColorConversionStrategy=/LeaveColorUnchanged',
-                        f'-dColorImageDepth={8 if quality < 85 else 24}',
-                    ])
-                elif ctype == "lzw":
-                    gs_cmd.extend([
-                        f'-dAutoFilterColorImages=false',
-                        f'-dColorImageFilter=/LZWEncode',
-                        f'-dAutoFilterGrayImages=false',
-                        f'-dGrayImageFilter=/LZWEncode',
-                        # LZW predictor to improve compression
-                        f'-dLZWPredictor=2',
-                        f'-dColorConversionStrategy=/LeaveColorUnchanged',
-                    ])
-                elif ctype == "png" or ctype == "flate":
-                    gs_cmd.extend([
-                        f'-dAutoFilterColorImages=false',
-                        f'-dColorImageFilter=/FlateEncode',
-                        f'-dAutoFilterGrayImages=false',
-                        f'-dGrayImageFilter=/FlateEncode',
-                        # Set flate predictor for better lossless compression
-                        f'-dFlatePrediction=2',
-                        f'-dColorConversionStrategy=/LeaveColorUnchanged',
-                    ])
-                else:
-                    # Default to JPEG
-                    gs_cmd.extend([
-                        f'-dAutoFilterColorImages=false',
-                        f'-dColorImageFilter=/DCTEncode',
-                        f'-dAutoFilterGrayImages=false',
-                        f'-dGrayImageFilter=/DCTEncode',
-                        f'-dJPEGQ={jpeg_quality}',
-                    ])
-            # --- IMPROVED: Add PDFSETTINGS presets for better compression ---
-            # Override default settings with quality-based presets if quality is at extremes
-            if quality < 30:
-                # Low quality: aggressive compression
-                gs_cmd.append('-dPDFSETTINGS=/ebook')
-            elif quality > 90:
-                # Very high quality: minimal compression
-                gs_cmd.append('-dPDFSETTINGS=/prepress')
-            # Quote the file paths and add to command
+            gs_path = _find_ghostscript()
+            if not gs_path:
+                self.log_with_timestamp("Ghostscript not found! PDF compression will not run.", "error")
+                return False
+            gs_cmd = [gs_path, *self._gs_options(initial_size_mb, quality, compression_type, downsample_threshold)]
+            # Paths go in as plain arguments; no shell is involved, so no quoting
             gs_cmd.extend([
-                f'-sOutputFile="{output_path}"',
-                f'"{input_path}"'
+                f'-sOutputFile={output_path}',
+                input_path
             ])
             # Execute compression
-            self.log_with_timestamp(f"Starting compression with command: {' '.join(gs_cmd)}", thread_name=thread_name)
-            run_kwargs = dict(
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True,
-                shell=True
-            )
-            if sys.platform.startswith("win"):
-                run_kwargs["creationflags"] = getattr(subprocess, "CREATE_NO_WINDOW", 0x08000000)
-            process = subprocess.run(
-                ' '.join(gs_cmd),
-                **run_kwargs
-            )
-            # --- Print Ghostscript output for debugging ---
-            self.log_with_timestamp(f"Ghostscript stdout: {process.stdout}", thread_name=thread_name)
-            if process.stderr:
-                self.log_with_timestamp(f"Ghostscript stderr: {process.stderr}", thread_name=thread_name)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Starting compression with command: %s", shlex.join(gs_cmd))
+            process = subprocess.run(gs_cmd, **_GS_RUN_KWARGS)
+            if process.stderr and logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Ghostscript output: {_stderr_tail(process.stderr)}")
             if process.returncode == 0 and os.path.exists(output_path):
-                initial_size = os.path.getsize(input_path) / (1024 * 1024)  # Convert to MB
-                final_size = os.path.getsize(output_path) / (1024 * 1024)  # Convert to MB
-                compression_ratio = (1 - final_size/initial_size) * 100
-                elapsed_time = time.time() - start_time
-                self.log_with_timestamp(
-                    f"\nCompression Results for {os.path.basename(input_path)}:",
-                    thread_name=thread_name
-                )
-                self.log_with_timestamp(
-                    f"- Initial size: {initial_size:.2f}MB",
-                    thread_name=thread_name
-                )
-                self.log_with_timestamp(
-                    f"- Final size: {final_size:.2f}MB",
-                    thread_name=thread_name
-                )
-                self.log_with_timestamp(
-                    f"- Compression ratio: {compression_ratio:.2f}%",
-                    thread_name=thread_name
-                )
-                self.log_with_timestamp(
-                    f"- Processing time: {elapsed_time:.2f}s",
-                    thread_name=thread_name
-                )
-                  # If compression actually made the file larger, use the original
-                # But be more lenient for small files (< 5% increase is acceptable)
-                size_increase_threshold = 0.05 if initial_size_mb < 2.0 else 0.0
-                if final_size > initial_size * (1 + size_increase_threshold):
-                    self.log_with_timestamp(
-                        f"Compression increased file size significantly, reverting to original.",
-                        thread_name=thread_name
-                    )
-                    os.remove(output_path)
-                    shutil.copy2(input_path, output_path)
-                    return True
-                elif final_size > initial_size:
-                    self.log_with_timestamp(
-                        f"Compression slightly increased file size but within acceptable threshold.",
-                        thread_name=thread_name
-                    )
-                return True
+                return self._check_output(input_path, output_path, initial_size_mb, start_time)
             else:
                 self.log_with_timestamp(
-                    f"Failed to compress {input_path}\nError: {process.stderr}",
-                    "error",
-                    thread_name=thread_name
+                    f"Failed to compress {input_path}\nError: {_stderr_tail(process.stderr)}",
+                    "error"
                 )
                 return False
         except Exception as e:
             self.log_with_timestamp(
                 f"Error compressing {input_path}: {str(e)}",
-                "error",
-                thread_name=thread_name
+                "error"
             )
             return False
-    def process_directory(self, input_folder: str, output_folder: str, quality: int, fast_mode: bool = True) -> None:
-        """Process all PDFs in a directory recursively using multithreading"""
+    def compress_pdf_batch(self, jobs: list, quality: int = 50, fast_mode: bool = True,
+                           compression_type: str = "jpeg",
+                           downsample_threshold: float = DOWNSAMPLE_THRESHOLD) -> list:
+        """
+        Compress several (input_path, output_path) jobs with Ghostscript.
+        Files that get identical settings share one Ghostscript process, which saves
+        its startup cost per file. Returns a success flag per job.
+        """
+        results = [False] * len(jobs)
+        gs_path = _find_ghostscript()
+        if not gs_path:
+            self.log_with_timestamp("Ghostscript not found! PDF compression will not run.", "error")
+            return results
+        # Settings depend on each file's size, so group by the resulting arguments
+        groups = {}
+        created_dirs = set()
+        for index, (input_path, output_path) in enumerate(jobs):
+            input_path = os.path.abspath(input_path)
+            output_path = os.path.abspath(output_path)
+            try:
+                initial_size_mb = os.path.getsize(input_path) / _MB
+            except OSError:
+                self.log_with_timestamp(f"Input file not found: {input_path}", "error")
+                continue
+            output_dir = os.path.dirname(output_path)
+            if output_dir not in created_dirs:
+                os.makedirs(output_dir, exist_ok=True)
+                created_dirs.add(output_dir)
+            if initial_size_mb < MIN_COMPRESSIBLE_MB:
+                results[index] = self._copy_uncompressed(input_path, output_path)
+                continue
+            options = self._gs_options(initial_size_mb, quality, compression_type, downsample_threshold)
+            groups.setdefault(options, []).append((index, input_path, output_path, initial_size_mb))
+        for options, group in groups.items():
+            for start in range(0, len(group), GS_BATCH_SIZE):
+                self._run_gs_group(gs_path, options, group[start:start + GS_BATCH_SIZE], results,
+                                   quality, fast_mode, compression_type, downsample_threshold)
+        return results
+    def _run_gs_group(self, gs_path: str, options: tuple, group: list, results: list,
+                      quality: int, fast_mode: bool, compression_type: str,
+                      downsample_threshold: float = DOWNSAMPLE_THRESHOLD):
+        """Compress a group of files sharing options in one Ghostscript run, filling in results"""
+        if len(group) == 1:
+            index, input_path, output_path, _ = group[0]
+            results[index] = self.compress_pdf(input_path, output_path, quality, fast_mode, compression_type,
+                                               downsample_threshold)
+            return
+        start_time = time.time()
+        # After the first file, setting a new OutputFile through setpagedevice closes
+        # the previous output and starts the next; SAFER needs each target permitted
+        gs_cmd = [gs_path, *options]
+        gs_cmd += [f"--permit-file-write={output_path}" for _, _, output_path, _ in group]
+        _, first_input, first_output, _ = group[0]
+        gs_cmd += [f"-sOutputFile={first_output}", first_input]
+        for _, input_path, output_path, _ in group[1:]:
+            gs_cmd += ["-c", f"<< /OutputFile {_ps_string(output_path)} >> setpagedevice", "-f", input_path]
+        logger.info("Compressing %d files in one Ghostscript run", len(group))
+        try:
+            process = subprocess.run(gs_cmd, **_GS_RUN_KWARGS)
+            succeeded = process.returncode == 0
+            if succeeded:
+                # One timing for the whole run; Ghostscript does not report per-file times
+                logger.info("Compressed %d files in %.2fs", len(group), time.time() - start_time)
+            else:
+                self.log_with_timestamp(
+                    f"Batched Ghostscript run failed, compressing files one by one\nError: {_stderr_tail(process.stderr)}",
+                    "error"
+                )
+        except Exception as e:
+            self.log_with_timestamp(f"Batched Ghostscript run failed: {str(e)}", "error")
+            succeeded = False
+        for index, input_path, output_path, initial_size_mb in group:
+            if succeeded and os.path.exists(output_path):
+                results[index] = self._check_output(input_path, output_path, initial_size_mb)
+            else:
+                # Outputs of a failed run may be partial; redo the file on its own
+                results[index] = self.compress_pdf(input_path, output_path, quality, fast_mode,
+                                                   compression_type, downsample_threshold)
+    def _iter_pdf_jobs(self, input_folder: str, output_folder: str):
+        """Yield (input_path, output_path) for each PDF under input_folder as the tree is walked"""
+        # Each folder travels with its output folder, so no relative paths are computed
+        pending = [(input_folder, output_folder)]
+        while pending:
+            folder, output_subdir = pending.pop()
+            try:
+                with os.scandir(folder) as entries:
+                    entries = list(entries)
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir():
+                    # Like os.walk, do not descend into symlinked directories
+                    if not entry.is_symlink():
+                        pending.append((entry.path, os.path.join(output_subdir, entry.name)))
+                elif entry.name.lower().endswith('.pdf'):
+                    # Output directories are created when each file is compressed
+                    yield entry.path, os.path.join(output_subdir, entry.name)
+    def process_directory(self, input_folder: str, output_folder: str, quality: int, fast_mode: bool = True,
+                          downsample_threshold: float = DOWNSAMPLE_THRESHOLD) -> None:
+        """Process all PDFs in a directory recursively using a pool of worker processes"""
         try:
             # Convert to absolute paths
             input_folder = os.path.abspath(input_folder)
             output_folder = os.path.abspath(output_folder)
-            # Get list of PDF files
-            pdf_files = []
-            for root, _, files in os.walk(input_folder):
-                for file in files:
-                    if file.lower().endswith('.pdf'):
-                        input_path = os.path.abspath(os.path.join(root, file))
-                        rel_path = os.path.relpath(os.path.dirname(input_path), input_folder)
-                        output_subdir = os.path.join(output_folder, rel_path)
-                        os.makedirs(output_subdir, exist_ok=True)
-                        output_path = os.path.abspath(os.path.join(output_subdir, f"{os.path.basename(file)}"))
-                        pdf_files.append((input_path, output_path, quality))
-            if not pdf_files:
+            max_threads = max(1, min(self.get_max_threads(),
+                                     psutil.virtual_memory().available // GS_WORKER_MEMORY))
+            jobs = self._iter_pdf_jobs(input_folder, output_folder)
+            # Look ahead far enough to keep every worker busy with full batches; if the
+            # whole tree fits, the file count is known and the work can be spread evenly
+            lookahead = list(islice(jobs, max_threads * GS_BATCH_SIZE))
+            if not lookahead:
                 self.log_with_timestamp("No PDF files found in the input directory")
                 return
-            # Get maximum number of threads
-            max_threads = min(len(pdf_files), self.get_max_threads())
-            self.log_with_timestamp(f"Processing {len(pdf_files)} files using {max_threads} threads")
-            # Process files using ThreadPoolExecutor
-            with ThreadPoolExecutor(max_workers=max_threads) as executor:
-                futures = []
-                for args in pdf_files:
-                    input_path, output_path, quality = args
-                    self.log_with_timestamp(f"Queueing file: {input_path}")
-                    futures.append(
-                        executor.submit(
-                            self.compress_pdf,
-                            input_path,
-                            output_path,
-                            quality,
-                            fast_mode
-                        )
-                    )
-                # Process results with progress bar
-                successful = 0
-                failed = 0
-                with tqdm(total=len(pdf_files), desc="Processing PDFs", unit="file") as pbar:
-                    for future in as_completed(futures):
-                        try:
-                            if future.result():
-                                successful += 1
-                            else:
-                                failed += 1
-                        except Exception as e:
-                            self.log_with_timestamp(f"Error in thread: {str(e)}", "error")
-                            failed += 1
-                        pbar.update(1)
+            if len(lookahead) < max_threads * GS_BATCH_SIZE:
+                total = len(lookahead)
+                max_threads = min(total, max_threads)
+                # Hand each worker a slice of files it can compress in shared Ghostscript
+                # runs, while still spreading the files over every worker
+                chunk_size = max(1, min(GS_BATCH_SIZE, -(-total // max_threads)))
+                self.log_with_timestamp(f"Processing {total} files using {max_threads} processes")
+            else:
+                total = None
+                chunk_size = GS_BATCH_SIZE
+                self.log_with_timestamp(f"Processing files using {max_threads} processes")
+            remaining = chain(lookahead, jobs)
+            chunks = iter(lambda: list(islice(remaining, chunk_size)), [])
+            # Process files in separate processes so the per-file Python work
+            # (command building, logging) does not serialize on the GIL
+            # Workers hand their log records to one listener thread here instead of
+            # each writing to the shared stream
+            log_queue = multiprocessing.Queue(-1)
+            listener = logging.handlers.QueueListener(
+                log_queue, *logging.getLogger().handlers, respect_handler_level=True
+            )
+            listener.start()
+            successful = 0
+            failed = 0
+            try:
+                with ProcessPoolExecutor(max_workers=max_threads, initializer=_init_worker_logging,
+                                         initargs=(log_queue,)) as executor, \
+                        tqdm(total=total, desc="Processing PDFs", unit="file") as pbar:
+                    futures = {}
+                    def submit_next():
+                        chunk = next(chunks, None)
+                        if chunk is None:
+                            return
+                        for input_path, _ in chunk:
+                            logger.info("Queueing file: %s", input_path)
+                        futures[executor.submit(compress_pdf_batch, chunk, quality, fast_mode,
+                                               downsample_threshold=downsample_threshold)] = len(chunk)
+                    # Keep a bounded window of batches in flight while the walk continues
+                    for _ in range(max_threads * 2):
+                        submit_next()
+                    while futures:
+                        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            count = futures.pop(future)
+                            try:
+                                results = future.result()
+                                successful += sum(results)
+                                failed += len(results) - sum(results)
+                            except Exception as e:
+                                self.log_with_timestamp(f"Error in worker: {str(e)}", "error")
+                                failed += count
+                            pbar.update(count)
+                            submit_next()
+            finally:
+                listener.stop()
+            processed = successful + failed
             # Log final statistics
             self.log_with_timestamp(
                 f"\nCompression Statistics:"
-                f"\n- Total files processed: {len(pdf_files)}"
+                f"\n- Total files processed: {processed}"
                 f"\n- Successfully compressed: {successful}"
                 f"\n- Failed: {failed}"
-                f"\n- Success rate: {(successful/len(pdf_files)*100):.2f}%"
+                f"\n- Success rate: {(successful/processed*100):.2f}%"
             )
         except Exception as e:
             self.log_with_timestamp(f"Error processing directory: {str(e)}", "error")
             raise
 # Export compress_pdf for import in ocr_processor.py
-def compress_pdf(input_path, output_path, quality=50, fast_mode=True, compression_type="jpeg"):
+def compress_pdf(input_path, output_path, quality=50, fast_mode=True, compression_type="jpeg",
+                 downsample_threshold=DOWNSAMPLE_THRESHOLD):
     """
     Compress a PDF file using Ghostscript.
     """
     processor = PDFProcessor()
-    return processor.compress_pdf(input_path, output_path, quality, fast_mode, compression_type=compression_type)
+    return processor.compress_pdf(input_path, output_path, quality, fast_mode, compression_type=compression_type,
+                                  downsample_threshold=downsample_threshold)
+def compress_pdf_batch(jobs, quality=50, fast_mode=True, compression_type="jpeg",
+                       downsample_threshold=DOWNSAMPLE_THRESHOLD):
+    """
+    Compress (input_path, output_path) pairs, sharing Ghostscript runs between files.
+    """
+    processor = PDFProcessor()
+    return processor.compress_pdf_batch(jobs, quality, fast_mode, compression_type=compression_type,
+                                        downsample_threshold=downsample_threshold)
 def main():
     parser = argparse.ArgumentParser(
         description="Recursively compress PDF files while preserving DPI and OCR layers"
@@ -407,6 +617,12 @@ def main():
         action="store_true",
         help="Enable fast mode (skip detailed page analysis)",
     )
+    parser.add_argument(
+        "--downsample-threshold",
+        type=float,
+        default=DOWNSAMPLE_THRESHOLD,
+        help=f"Only downsample images whose resolution exceeds the target by this factor (default: {DOWNSAMPLE_THRESHOLD})",
+    )
     args = parser.parse_args()
     processor = PDFProcessor()
     # Log start of processing
@@ -415,7 +631,7 @@ def main():
         f"Mode: {'Fast' if args.fast else 'Detailed analysis'}"
     )
     processor.log_with_timestamp(
-        f"Available CPU threads: {processor.get_max_threads()}"
+        f"Available CPU cores: {processor.get_max_threads()}"
     )
     processor.log_with_timestamp(f"Input path: {args.input}")
     processor.log_with_timestamp(f"Output path: {args.output}")
@@ -427,11 +643,13 @@ def main():
             output_path = os.path.join(
                 args.output, f"{os.path.basename(args.input)}"
             )
-            processor.compress_pdf(args.input, output_path, args.quality, args.fast)
+            processor.compress_pdf(args.input, output_path, args.quality, args.fast,
+                                   downsample_threshold=args.downsample_threshold)
         elif os.path.isdir(args.input):
             processor.log_with_timestamp("Processing directory mode")
             processor.process_directory(
-                args.input, args.output, args.quality, args.fast
+                args.input, args.output, args.quality, args.fast,
+                downsample_threshold=args.downsample_threshold
             )
         else:
             processor.log_with_timestamp(
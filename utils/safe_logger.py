@@ -1,29 +1,82 @@
 import logging
+import threading
 import weakref
+from collections import deque
 class SafeLogHandler(logging.Handler):
-    def __init__(self, widget=None):
+    def __init__(self, widget=None, max_buffer=10000, flush_interval_ms=30):
         super().__init__()
-        self._widget_ref = weakref.ref(widget) if widget else None
-        self._recursion_prevention = False
+        self._widget_ref = weakref.ref(widget) if widget is not None else None
+        # Per-thread guard, so one thread's logging cannot suppress another's
+        self._tls = threading.local()
+        # Records from worker threads wait here until the GUI thread drains them
+        self._pending = deque(maxlen=max_buffer)
+        self._flush_timer = self._start_flush_timer(widget, flush_interval_ms)
+    def _start_flush_timer(self, widget, interval_ms):
+        """
+        Drain pending records on the widget's (GUI) thread with a QTimer owned by the
+        widget, so it stops when the widget is destroyed. None if widget is not a QObject.
+        """
+        if widget is None:
+            return None
+        try:
+            from PyQt6.QtCore import QObject, QTimer
+        except ImportError:
+            return None
+        if not isinstance(widget, QObject):
+            return None
+        timer = QTimer(widget)
+        timer.setInterval(interval_ms)
+        timer.timeout.connect(self.flush_to_widget)
+        timer.start()
+        return timer
     def emit(self, record):
-        if self._recursion_prevention:
+        if getattr(self._tls, 'busy', False):
             return
         try:
-            self._recursion_prevention = True
-            msg = self.format(record)
-            # Get widget safely
-            widget = self._widget_ref() if self._widget_ref else None
-            if widget and hasattr(widget, 'append'):
-                try:
-                    widget.append(msg)
-                except RuntimeError:
-                    # Widget was deleted, remove handler
-                    logger = logging.getLogger()
-                    logger.removeHandler(self)
+            self._tls.busy = True
+            self._pending.append(self.format(record))
+            # Only the GUI thread may touch a Qt widget; other threads leave their
+            # records for the flush timer. Without a timer nothing else would drain
+            # them, so append directly as before
+            if self._flush_timer is None or threading.current_thread() is threading.main_thread():
+                self.flush_to_widget()
         except Exception:
             self.handleError(record)
         finally:
-            self._recursion_prevention = False
+            self._tls.busy = False
+    def flush_to_widget(self):
+        """Append all pending records to the widget in one call; call from the GUI thread, e.g. on a QTimer"""
+        if not self._pending:
+            return
+        # Get widget safely
+        widget = self._widget_ref() if self._widget_ref else None
+        append = getattr(widget, 'append', None) if widget is not None else None
+        if append is None:
+            self._pending.clear()
+            return
+        lines = []
+        try:
+            while self._pending:
+                lines.append(self._pending.popleft())
+        except IndexError:
+            # Another thread drained the rest first
+            pass
+        if not lines:
+            return
+        try:
+            append('\n'.join(lines))
+        except RuntimeError:
+            # Widget was deleted, remove handler
+            logger = logging.getLogger()
+            logger.removeHandler(self)
     def clear_widget(self):
         """Clear widget reference"""
+        if self._flush_timer is not None:
+            try:
+                self._flush_timer.stop()
+            except RuntimeError:
+                # Already destroyed along with the widget
+                pass
+            self._flush_timer = None
         self._widget_ref = None
+        self._pending.clear()
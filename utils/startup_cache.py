@@ -4,17 +4,29 @@ Enhanced Startup Cache System for VisionLane OCR
 Provides caching for DocTR setup, model downloads, and system checks
 """
 import json
+import os
 import time
 import hashlib
 from pathlib import Path
 from typing import Dict, Any, Optional, List
 import logging
+try:
+    import orjson
+except ImportError:
+    orjson = None
 logger = logging.getLogger(__name__)
+# Cache directories already created in this process
+_ensured_dirs = set()
+def _ensure_dir(path: Path):
+    """Create a directory once per process"""
+    if path not in _ensured_dirs:
+        path.mkdir(parents=True, exist_ok=True)
+        _ensured_dirs.add(path)
 class StartupCache:
     """Enhanced caching system for startup operations"""
     def __init__(self, cache_dir: Optional[Path] = None):
         self.cache_dir = cache_dir or Path.home() / ".cache" / "visionlane_ocr"
-        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        _ensure_dir(self.cache_dir)
         # Cache files
         self.doctr_cache_file = self.cache_dir / "doctr_setup.json"
         self.models_cache_file = self.cache_dir / "models_status.json"
@@ -24,69 +36,121 @@ class StartupCache:
         self.DOCTR_CACHE_EXPIRY = 24 * 60 * 60  # 24 hours
         self.MODELS_CACHE_EXPIRY = 7 * 24 * 60 * 60  # 7 days
         self.SYSTEM_CACHE_EXPIRY = 60 * 60  # 1 hour
+        # Parsed cache files by path, with the mtime they were read at
+        self._mem: Dict[Path, tuple] = {}
     def _is_cache_valid(self, cache_file: Path, expiry_seconds: int) -> bool:
         """Check if cache file exists and is not expired"""
-        if not cache_file.exists():
-            return False
         try:
-            stat = cache_file.stat()
-            age = time.time() - stat.st_mtime
-            return age < expiry_seconds
-        except Exception:
+            return time.time() - cache_file.stat().st_mtime < expiry_seconds
+        except OSError:
             return False
-    def _load_cache(self, cache_file: Path) -> Optional[Dict[str, Any]]:
-        """Load cache data from file"""
+    @staticmethod
+    def _parse(content: bytes) -> Dict[str, Any]:
+        return orjson.loads(content) if orjson else json.loads(content)
+    def _load_cache(self, cache_file: Path, expiry_seconds: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Load cache data from file, reusing the parsed data while the file is unchanged.
+        With expiry_seconds, an expired file counts as missing; one stat serves both checks.
+        """
+        try:
+            mtime_ns = cache_file.stat().st_mtime_ns
+        except OSError:
+            return None
+        if expiry_seconds is not None and time.time() - mtime_ns / 1e9 >= expiry_seconds:
+            return None
+        memo = self._mem.get(cache_file)
+        if memo and memo[0] == mtime_ns:
+            return dict(memo[1])
         try:
-            if cache_file.exists():
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+            data = self._parse(cache_file.read_bytes())
         except Exception as e:
             logger.warning(f"Failed to load cache from {cache_file}: {e}")
-        return None
+            return None
+        self._mem[cache_file] = (mtime_ns, data)
+        return dict(data)
     def _save_cache(self, cache_file: Path, data: Dict[str, Any]) -> bool:
         """Save cache data to file"""
         try:
-            cache_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
+            if self._refresh_if_unchanged(cache_file, data):
+                return True
+            _ensure_dir(cache_file.parent)
+            # Compact output: the files are only read by this class
+            if orjson:
+                content = orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+            else:
+                content = json.dumps(data, separators=(',', ':')).encode('utf-8')
+            # Write beside the cache and swap it in, so an interrupted write never
+            # leaves a truncated file behind
+            tmp_file = cache_file.with_suffix('.tmp')
+            tmp_file.write_bytes(content)
+            os.replace(tmp_file, cache_file)
+            # Remember what a reload would return
+            self._mem[cache_file] = (cache_file.stat().st_mtime_ns, self._parse(content))
             return True
         except Exception as e:
             logger.warning(f"Failed to save cache to {cache_file}: {e}")
             return False
+    def _refresh_if_unchanged(self, cache_file: Path, data: Dict[str, Any]) -> bool:
+        """
+        If the file already holds this data (apart from its timestamp), only bump its
+        mtime, which is what expiry is measured from; returns True if it did so.
+        """
+        memo = self._mem.get(cache_file)
+        if not memo:
+            return False
+        def payload(d):
+            return {k: v for k, v in d.items() if k != 'timestamp'}
+        if payload(memo[1]) != payload(data):
+            return False
+        try:
+            if cache_file.stat().st_mtime_ns != memo[0]:
+                return False
+            os.utime(cache_file, None)
+            self._mem[cache_file] = (cache_file.stat().st_mtime_ns, memo[1])
+        except OSError:
+            return False
+        return True
     def get_config_hash(self, config_path: Path) -> str:
         """Generate hash of config file for cache invalidation"""
         try:
             if config_path.exists():
-                content = config_path.read_text(encoding='utf-8')
-                return hashlib.md5(content.encode()).hexdigest()
+                # Change detection only; blake2b is faster than md5 and needs no decode
+                return hashlib.blake2b(config_path.read_bytes(), digest_size=16).hexdigest()
         except Exception:
             pass
         return "no_config"
+    def _config_fingerprint(self, config_path: Path) -> Optional[Dict[str, int]]:
+        """Cheap (mtime, size) fingerprint of the config file, or None if it is missing"""
+        try:
+            st = config_path.stat()
+        except OSError:
+            return None
+        return {'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
     def is_config_changed(self, config_path: Path) -> bool:
         """Check if config file has changed since last cache"""
-        current_hash = self.get_config_hash(config_path)
         cached_data = self._load_cache(self.config_cache_file)
         if not cached_data:
             return True
-        return cached_data.get('config_hash') != current_hash
+        # An untouched file keeps its fingerprint, so it need not be read and hashed
+        fingerprint = self._config_fingerprint(config_path)
+        if fingerprint and all(cached_data.get(k) == v for k, v in fingerprint.items()):
+            return False
+        return cached_data.get('config_hash') != self.get_config_hash(config_path)
     def update_config_hash(self, config_path: Path):
         """Update stored config hash"""
         config_hash = self.get_config_hash(config_path)
         self._save_cache(self.config_cache_file, {
             'config_hash': config_hash,
+            **(self._config_fingerprint(config_path) or {}),
             'timestamp': time.time()
         })
     # DocTR Cache Methods
     def get_cached_doctr_setup(self) -> Optional[Dict[str, Any]]:
         """Get cached DocTR setup results"""
-        if not self._is_cache_valid(self.doctr_cache_file, self.DOCTR_CACHE_EXPIRY):
-            return None
-        return self._load_cache(self.doctr_cache_file)
+        return self._load_cache(self.doctr_cache_file, self.DOCTR_CACHE_EXPIRY)
     def cache_doctr_setup(self, success: bool, pytorch_version: str = None,
                          gpu_info: str = None, **kwargs):
         """Cache DocTR setup results with enhanced logging"""
-        import logging
-        logger = logging.getLogger(__name__)
         data = {
             'success': success,
             'timestamp': time.time(),
@@ -103,13 +167,9 @@ class StartupCache:
     # Models Cache Methods
     def get_cached_models_status(self) -> Optional[Dict[str, Any]]:
         """Get cached models status"""
-        if not self._is_cache_valid(self.models_cache_file, self.MODELS_CACHE_EXPIRY):
-            return None
-        return self._load_cache(self.models_cache_file)
+        return self._load_cache(self.models_cache_file, self.MODELS_CACHE_EXPIRY)
     def cache_models_status(self, models_info: Dict[str, Any]):
         """Cache models status with logging"""
-        import logging
-        logger = logging.getLogger(__name__)
         data = {
             'timestamp': time.time(),
             **models_info
@@ -123,9 +183,7 @@ class StartupCache:
     # System Info Cache Methods
     def get_cached_system_info(self) -> Optional[Dict[str, Any]]:
         """Get cached system information"""
-        if not self._is_cache_valid(self.system_cache_file, self.SYSTEM_CACHE_EXPIRY):
-            return None
-        return self._load_cache(self.system_cache_file)
+        return self._load_cache(self.system_cache_file, self.SYSTEM_CACHE_EXPIRY)
     def cache_system_info(self, system_info: Dict[str, Any]):
         """Cache system information"""
         data = {
@@ -135,8 +193,6 @@ class StartupCache:
         self._save_cache(self.system_cache_file, data)
     def clear_cache(self, cache_type: str = None):
         """Clear cache files with enhanced logging"""
-        import logging
-        logger = logging.getLogger(__name__)
         cache_files = {
             'doctr': self.doctr_cache_file,
             'models': self.models_cache_file,
@@ -10,250 +10,204 @@ from typing import Dict, Any, Optional
 import logging
 import os
 logger = logging.getLogger(__name__)
+# CPU thread count, read once at import and used as the default worker count
+_MAX_CPU_THREADS = os.cpu_count() or 4
+_MAX_CPU_THREADS_STR = str(_MAX_CPU_THREADS)
+# Default values per section, in the order sections are created
+_SECTION_DEFAULTS = {
+    'General': {
+        'dpi': 'Auto',
+        'output_format': 'PDF',
+        'theme_mode': 'system',
+        'detection_model': 'db_resnet50',
+        'recognition_model': 'parseq',
+        'compress_enabled': 'False',
+        'compression_type': 'jpeg',
+        'compression_quality': '100',
+        'archive_enabled': 'False'
+    },
+    'Paths': {
+        'archive_single': '',
+        'archive_folder': '',
+        'archive_pdf': '',
+        'single': '',
+        'folder': '',
+        'pdf': '',
+        'output_single': '',
+        'output_folder': '',
+        'output_pdf': ''
+    },
+    'Performance': {
+        'thread_count': _MAX_CPU_THREADS_STR,
+        'operation_timeout': '300',
+        'chunk_timeout': '60'
+    },
+    'Startup': {
+        'enable_parallel_loading': 'True',
+        'show_detailed_progress': 'True',
+        'cache_validation_results': 'True',
+        'skip_doctr_setup_check': 'False',
+        'skip_model_validation': 'False',
+        'auto_download_models': 'True',
+        'use_minimal_diagnostics': 'False',
+        'startup_timeout': '120',
+        'max_parallel_workers': _MAX_CPU_THREADS_STR,
+        'cache_expiry_hours': '24',
+        'skip_system_diagnostics': 'False',
+        'detailed_logging': 'True',
+        'log_level': 'INFO'
+    },
+}
+# Comment block written above the [Startup] section
+_STARTUP_WARNING = (
+    '\n# ============================================================================\n'
+    '# EXPERIMENTAL STARTUP CONFIGURATION - PLEASE EDIT CAREFULLY\n'
+    '# These settings control advanced startup behavior and parallel loading.\n'
+    '# Modifying these values may cause application instability or startup failures.\n'
+    '# Only change these settings if you understand the technical implications.\n'
+    '# ============================================================================\n'
+)
+# Expected type of each known [Startup] option, so values are converted directly
+# rather than by trial and error
+_STARTUP_OPTION_TYPES = {
+    'enable_parallel_loading': bool,
+    'show_detailed_progress': bool,
+    'cache_validation_results': bool,
+    'skip_doctr_setup_check': bool,
+    'skip_model_validation': bool,
+    'auto_download_models': bool,
+    'use_minimal_diagnostics': bool,
+    'startup_timeout': int,
+    'max_parallel_workers': int,
+    'cache_expiry_hours': int,
+    'skip_system_diagnostics': bool,
+    'detailed_logging': bool,
+    'log_level': str,
+    'fast_startup_mode': bool,
+}
 class StartupConfig:
     """Manages unified configuration with startup and runtime settings"""
     def __init__(self, config_path: Optional[Path] = None):
         self.config_path = config_path or Path(__file__).parent.parent / "config.ini"
         self.config = configparser.ConfigParser()
-        # Get max CPU threads
-        self.max_cpu_threads = os.cpu_count() or 4
+        self.max_cpu_threads = _MAX_CPU_THREADS
+        # Parsed [Startup] values, built on first use and dropped when the section changes
+        self._startup_opts = None
+        # Set when the in-memory config differs from config.ini
+        self._dirty = False
+        # Defaults are filled in by a single pass after loading, which also saves
+        # the file if anything was missing
         self.load_config()
         self.ensure_all_sections()
     def load_config(self):
-        """Load main configuration"""
+        """Load main configuration; missing sections and keys are added by ensure_all_sections"""
         try:
             if self.config_path.exists():
                 self.config.read(self.config_path, encoding="utf-8")
                 logger.info(f"Loaded config from {self.config_path}")
             else:
                 logger.info("Config file not found, creating with defaults")
-                self.create_default_config()
         except Exception as e:
             logger.warning(f"Failed to load config: {e}")
-            self.create_default_config()
     def create_default_config(self):
         """Create default configuration structure with all sections"""
         self.add_general_section()
         self.add_startup_section()
         self.add_paths_section()
         self.add_performance_section()
+        self._startup_opts = None
         self.save_config()
+    def _add_missing_defaults(self, section: str) -> bool:
+        """Add the section and any missing keys, keeping existing values; returns True if anything was added"""
+        changed = False
+        if not self.config.has_section(section):
+            self.config.add_section(section)
+            changed = True
+        for key, value in _SECTION_DEFAULTS[section].items():
+            if not self.config.has_option(section, key):
+                self.config.set(section, key, value)
+                changed = True
+        if changed:
+            self._dirty = True
+        return changed
     def add_general_section(self):
-        """Add General section with defaults (only if section doesn't exist)"""
-        if not self.config.has_section('General'):
-            self.config.add_section('General')
-            general_defaults = {
-                'dpi': 'Auto',
-                'output_format': 'PDF',
-                'theme_mode': 'system',
-                'detection_model': 'db_resnet50',
-                'recognition_model': 'parseq',
-                'compress_enabled': 'False',
-                'compression_type': 'jpeg',
-                'compression_quality': '100',
-                'archive_enabled': 'False'
-            }
-            for key, value in general_defaults.items():
-                self.config.set('General', key, value)
+        """Add General section with defaults"""
+        self._add_missing_defaults('General')
     def add_startup_section(self):
         """Add Startup section with defaults using max CPU threads"""
-        if not self.config.has_section('Startup'):
-            self.config.add_section('Startup')
-        startup_defaults = {
-            'enable_parallel_loading': 'True',
-            'show_detailed_progress': 'True',
-            'cache_validation_results': 'True',
-            'skip_doctr_setup_check': 'False',
-            'skip_model_validation': 'False',
-            'auto_download_models': 'True',
-            'use_minimal_diagnostics': 'False',
-            'startup_timeout': '120',
-            'max_parallel_workers': str(self.max_cpu_threads),
-            'cache_expiry_hours': '24',
-            'skip_system_diagnostics': 'False',
-            'detailed_logging': 'True',
-            'log_level': 'INFO'
-        }
-        for key, value in startup_defaults.items():
-            if not self.config.has_option('Startup', key):
-                self.config.set('Startup', key, value)
+        self._add_missing_defaults('Startup')
     def add_paths_section(self):
         """Add Paths section with defaults"""
-        if not self.config.has_section('Paths'):
-            self.config.add_section('Paths')
-        paths_defaults = {
-            'archive_single': '',
-            'archive_folder': '',
-            'archive_pdf': '',
-            'single': '',
-            'folder': '',
-            'pdf': '',
-            'output_single': '',
-            'output_folder': '',
-            'output_pdf': ''
-        }
-        for key, value in paths_defaults.items():
-            if not self.config.has_option('Paths', key):
-                self.config.set('Paths', key, value)
+        self._add_missing_defaults('Paths')
     def add_performance_section(self):
         """Add Performance section with max CPU threads"""
-        if not self.config.has_section('Performance'):
-            self.config.add_section('Performance')
-        performance_defaults = {
-            'thread_count': str(self.max_cpu_threads),
-            'operation_timeout': '300',
-            'chunk_timeout': '60'
-        }
-        for key, value in performance_defaults.items():
-            if not self.config.has_option('Performance', key):
-                self.config.set('Performance', key, value)
-    def save_config(self):
-        """Save configuration to config.ini with proper section ordering and warnings"""
+        self._add_missing_defaults('Performance')
+    def save_config(self, force: bool = False):
+        """Save configuration to config.ini with proper section ordering and warnings; skipped when nothing changed"""
+        if not (self._dirty or force):
+            return
         try:
-            # Create a new config parser to control ordering
-            ordered_config = configparser.ConfigParser()
-            # Add sections in desired order
-            # 1. General section
-            if self.config.has_section('General'):
-                ordered_config.add_section('General')
-                for key, value in self.config.items('General'):
-                    ordered_config.set('General', key, value)
-            # 2. Paths section
-            if self.config.has_section('Paths'):
-                ordered_config.add_section('Paths')
-                for key, value in self.config.items('Paths'):
-                    ordered_config.set('Paths', key, value)
-            # 3. Performance section
-            if self.config.has_section('Performance'):
-                ordered_config.add_section('Performance')
-                for key, value in self.config.items('Performance'):
-                    ordered_config.set('Performance', key, value)
-            # 4. Startup section (LAST with warning)
-            if self.config.has_section('Startup'):
-                ordered_config.add_section('Startup')
-                for key, value in self.config.items('Startup'):
-                    ordered_config.set('Startup', key, value)
-            # Write to file with custom formatting
-            with open(self.config_path, 'w', encoding="utf-8") as f:
-                # Write sections manually to add comments
-                for section_name in ordered_config.sections():
-                    if section_name == 'Startup':
-                        # Add warning comment before Startup section
-                        f.write('\n# ============================================================================\n')
-                        f.write('# EXPERIMENTAL STARTUP CONFIGURATION - PLEASE EDIT CAREFULLY\n')
-                        f.write('# These settings control advanced startup behavior and parallel loading.\n')
-                        f.write('# Modifying these values may cause application instability or startup failures.\n')
-                        f.write('# Only change these settings if you understand the technical implications.\n')
-                        f.write('# ============================================================================\n')
-                    f.write(f'[{section_name}]\n')
-                    for key, value in ordered_config.items(section_name):
-                        f.write(f'{key} = {value}\n')
-                    f.write('\n')  # Add blank line after each section
+            # Build the file with custom formatting, sections in their fixed order
+            buf = []
+            for section_name in _SECTION_DEFAULTS:
+                if not self.config.has_section(section_name):
+                    continue
+                if section_name == 'Startup':
+                    # Add warning comment before Startup section
+                    buf.append(_STARTUP_WARNING)
+                buf.append(f'[{section_name}]\n')
+                for key, value in self.config.items(section_name):
+                    buf.append(f'{key} = {value}\n')
+                buf.append('\n')  # Add blank line after each section
+            # One write to a temporary file, then swap it in so config.ini is never half-written
+            tmp_path = self.config_path.with_suffix('.ini.tmp')
+            with open(tmp_path, 'w', encoding="utf-8") as f:
+                f.write(''.join(buf))
+            os.replace(tmp_path, self.config_path)
+            self._dirty = False
             logger.info(f"Saved config to {self.config_path}")
         except Exception as e:
             logger.error(f"Failed to save config: {e}")
     def ensure_all_sections(self):
         """Ensure all sections exist with default values, but preserve existing values"""
         changed = False
-        # Ensure sections exist in the correct order
-        required_sections = ['General', 'Paths', 'Performance', 'Startup']
-        for section in required_sections:
-            if not self.config.has_section(section):
-                self.config.add_section(section)
-                changed = True
-        # General section defaults
-        if not self.config.has_section('General'):
-            self.add_general_section()
-            changed = True
-        else:
-            general_defaults = {
-                'dpi': 'Auto',
-                'output_format': 'PDF',
-                'theme_mode': 'system',
-                'detection_model': 'db_resnet50',
-                'recognition_model': 'parseq',
-                'compress_enabled': 'False',
-                'compression_type': 'jpeg',
-                'compression_quality': '100',
-                'archive_enabled': 'False'
-            }
-            for key, value in general_defaults.items():
-                if not self.config.has_option('General', key):
-                    self.config.set('General', key, value)
-                    changed = True
-        # Paths section defaults
-        if not self.config.has_section('Paths'):
-            self.add_paths_section()
-            changed = True
-        else:
-            paths_defaults = {
-                'archive_single': '',
-                'archive_folder': '',
-                'archive_pdf': '',
-                'single': '',
-                'folder': '',
-                'pdf': '',
-                'output_single': '',
-                'output_folder': '',
-                'output_pdf': ''
-            }
-            for key, value in paths_defaults.items():
-                if not self.config.has_option('Paths', key):
-                    self.config.set('Paths', key, value)
-                    changed = True
-        # Performance section defaults
-        if not self.config.has_section('Performance'):
-            self.add_performance_section()
-            changed = True
-        else:
-            performance_defaults = {
-                'thread_count': str(self.max_cpu_threads),
-                'operation_timeout': '300',
-                'chunk_timeout': '60'
-            }
-            for key, value in performance_defaults.items():
-                if not self.config.has_option('Performance', key):
-                    self.config.set('Performance', key, value)
-                    changed = True
-        # Startup section defaults (LAST)
-        if not self.config.has_section('Startup'):
-            self.add_startup_section()
-            changed = True
-        else:
-            startup_defaults = {
-                'enable_parallel_loading': 'True',
-                'show_detailed_progress': 'True',
-                'cache_validation_results': 'True',
-                'skip_doctr_setup_check': 'False',
-                'skip_model_validation': 'False',
-                'auto_download_models': 'True',
-                'use_minimal_diagnostics': 'False',
-                'startup_timeout': '120',
-                'max_parallel_workers': str(self.max_cpu_threads),
-                'cache_expiry_hours': '24',
-                'skip_system_diagnostics': 'False'
-            }
-            for key, value in startup_defaults.items():
-                if not self.config.has_option('Startup', key):
-                    self.config.set('Startup', key, value)
-                    changed = True
+        for section in _SECTION_DEFAULTS:
+            changed = self._add_missing_defaults(section) or changed
         if changed:
+            self._startup_opts = None
             self.save_config()
+    @staticmethod
+    def _parse_option_value(value: str, expected_type: Optional[type] = None) -> Any:
+        """Convert a raw config string to bool, int, float or str"""
+        if expected_type is str:
+            return value
+        if expected_type is bool and value.lower() in ('true', 'false'):
+            return value.lower() == 'true'
+        if expected_type is int and value.strip().lstrip('+-').isdigit():
+            return int(value)
+        # Unknown option or unexpected value: infer the type
+        if value.lower() in ('true', 'false'):
+            return value.lower() == 'true'
+        try:
+            return int(value)
+        except ValueError:
+            try:
+                return float(value)
+            except ValueError:
+                return value
+    def _get_startup_options(self) -> Dict[str, Any]:
+        """All [Startup] values, parsed once"""
+        if self._startup_opts is None:
+            opts = {}
+            if self.config.has_section('Startup'):
+                for key, value in self.config.items('Startup'):
+                    opts[key] = self._parse_option_value(value, _STARTUP_OPTION_TYPES.get(key))
+            self._startup_opts = opts
+        return self._startup_opts
     def get_startup_option(self, key: str, default: Any = None) -> Any:
         """Get a startup option value"""
         try:
-            if self.config.has_option('Startup', key):
-                value = self.config.get('Startup', key)
-                if value.lower() in ('true', 'false'):
-                    return value.lower() == 'true'
-                try:
-                    return int(value)
-                except ValueError:
-                    try:
-                        return float(value)
-                    except ValueError:
-                        return value
-            return default
+            return self._get_startup_options().get(self.config.optionxform(key), default)
         except Exception as e:
             logger.warning(f"Failed to get startup option {key}: {e}")
             return default
@@ -263,6 +217,8 @@ class StartupConfig:
             if not self.config.has_section('Startup'):
                 self.config.add_section('Startup')
             self.config.set('Startup', key, str(value))
+            self._startup_opts = None
+            self._dirty = True
             self.save_config()
         except Exception as e:
             logger.error(f"Failed to set startup option {key}: {e}")
@@ -293,14 +249,11 @@ class StartupConfig:
     def get_log_level(self) -> str:
         return self.get_startup_option('log_level', 'INFO')
     def get_all_options(self) -> Dict[str, Any]:
-        options = {}
-        if self.config.has_section('Startup'):
-            for key in self.config.options('Startup'):
-                options[key] = self.get_startup_option(key)
-        return options
+        return dict(self._get_startup_options())
     def reset_to_defaults(self):
         for section in self.config.sections():
             self.config.remove_section(section)
+        self._dirty = True
         self.create_default_config()
         logger.info("Reset all configuration to defaults")
     def get_summary(self) -> str:
@@ -10,32 +10,131 @@ import time
 import logging
 import threading
 import socket
+import functools
+import types
 import hashlib
+import os
+import queue
+import shutil
+import importlib.util
+from importlib.metadata import version as dist_version, PackageNotFoundError
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Dict, Any, Callable, Optional
 logger = logging.getLogger(__name__)
+# Seconds a check result stays valid; installed packages rarely change within a session
+LIVE_STATS_TTL = 60
+INSTALL_INFO_TTL = 600
+# Connectivity probe target and timeout (seconds)
+INTERNET_PROBE_ADDR = ("8.8.8.8", 53)
+INTERNET_PROBE_TIMEOUT = 0.3
+# Root of the drive the interpreter is installed on ("/" outside Windows)
+if sys.platform == 'win32':
+    _INSTALL_ROOT = os.path.splitdrive(sys.executable)[0] + os.sep
+else:
+    _INSTALL_ROOT = '/'
+_BYTE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+# Check results shared by all SystemDiagnostics instances: name -> (monotonic time, result)
+_results_cache: Dict[str, tuple] = {}
+_results_lock = threading.Lock()
+# Serializes first imports of torch/doctr, whose extension init is not safe to
+# run from two threads at once
+_heavy_import_lock = threading.Lock()
+def _ttl_cached(ttl: float):
+    """Reuse a check's result for ttl seconds across calls and instances"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self):
+            key = method.__name__
+            with _results_lock:
+                entry = _results_cache.get(key)
+            if entry and time.monotonic() - entry[0] < ttl:
+                return dict(entry[1])
+            result = method(self)
+            with _results_lock:
+                _results_cache[key] = (time.monotonic(), result)
+            return dict(result)
+        return wrapper
+    return decorator
+@functools.lru_cache(maxsize=None)
+def _cpu_counts() -> tuple:
+    """Physical and logical core counts; fixed for the life of the process"""
+    return psutil.cpu_count(logical=False), psutil.cpu_count(logical=True)
+@functools.lru_cache(maxsize=None)
+def _cuda_available() -> bool:
+    """torch.cuda.is_available(), which probes the driver; fixed once torch is loaded"""
+    import torch
+    return torch.cuda.is_available()
+@functools.lru_cache(maxsize=16)
+def _gpu_properties(index: int) -> Dict[str, Any]:
+    """Snapshot of a CUDA device's static properties"""
+    import torch
+    props = torch.cuda.get_device_properties(index)
+    return {
+        'name': props.name,
+        'total_memory': props.total_memory,
+        'capability': f"{props.major}.{props.minor}"
+    }
+@functools.lru_cache(maxsize=None)
+def _platform_info() -> types.MappingProxyType:
+    """
+    platform.* values, read once. Some of them shell out (uname -p, ver), so this is
+    computed on first use rather than at import, which the quick path never needs.
+    """
+    return types.MappingProxyType({
+        'system': platform.system(),
+        'release': platform.release(),
+        'version': platform.version(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'architecture': platform.architecture()[0]
+    })
+def _interpreter_key() -> str:
+    """Identifies the Python environment; quick diagnostics only change along with it"""
+    try:
+        exe_mtime = os.path.getmtime(sys.executable)
+    except OSError:
+        exe_mtime = 0
+    identity = f"{sys.executable}|{sys.version}|{platform.machine()}|{exe_mtime}"
+    return hashlib.blake2s(identity.encode('utf-8')).hexdigest()
+def clear_diagnostics_cache():
+    """Forget cached check results, forcing the next run to probe again"""
+    with _results_lock:
+        _results_cache.clear()
 class SystemDiagnostics:
     """Advanced system diagnostics and health checks"""
     def __init__(self, progress_callback: Callable[[str], None] = None):
         self.progress_callback = progress_callback or (lambda x: print(x))
         self.diagnostics_data = {}
+        # While run_diagnostics runs checks on worker threads, their progress messages
+        # queue here and are delivered on the calling thread, which owns the callback
+        self._deferred_progress: Optional[queue.SimpleQueue] = None
+        # Arm psutil's counters so check_performance_metrics can read CPU usage
+        # since now without sleeping
+        psutil.cpu_percent(interval=None)
     def update_progress(self, message: str):
         """Update progress message"""
-        if self.progress_callback:
+        deferred = self._deferred_progress
+        if deferred is not None:
+            deferred.put(message)
+        elif self.progress_callback:
             self.progress_callback(message)
+    def _flush_deferred_progress(self, deferred: queue.SimpleQueue):
+        """Deliver progress queued by worker threads on the calling thread"""
+        while True:
+            try:
+                message = deferred.get_nowait()
+            except queue.Empty:
+                break
+            if self.progress_callback:
+                self.progress_callback(message)
+    @_ttl_cached(LIVE_STATS_TTL)
     def get_system_info(self) -> Dict[str, Any]:
         """Get comprehensive system information"""
         self.update_progress("Analyzing system hardware...")
         info = {}
         # Basic system info
-        info['platform'] = {
-            'system': platform.system(),
-            'release': platform.release(),
-            'version': platform.version(),
-            'machine': platform.machine(),
-            'processor': platform.processor(),
-            'architecture': platform.architecture()[0]
-        }
+        info['platform'] = dict(_platform_info())
         # Python info
         info['python'] = {
             'version': sys.version,
@@ -55,17 +154,19 @@ class SystemDiagnostics:
             info['memory'] = {'error': str(e)}
         # CPU info
         try:
+            cores, logical_cores = _cpu_counts()
+            freq = psutil.cpu_freq()
             info['cpu'] = {
-                'cores': psutil.cpu_count(logical=False),
-                'logical_cores': psutil.cpu_count(logical=True),
-                'current_freq': psutil.cpu_freq().current if psutil.cpu_freq() else 'Unknown',
-                'max_freq': psutil.cpu_freq().max if psutil.cpu_freq() else 'Unknown'
+                'cores': cores,
+                'logical_cores': logical_cores,
+                'current_freq': freq.current if freq else 'Unknown',
+                'max_freq': freq.max if freq else 'Unknown'
             }
         except Exception as e:
             info['cpu'] = {'error': str(e)}
         # Disk info
         try:
-            disk = psutil.disk_usage('/')
+            disk = shutil.disk_usage(_INSTALL_ROOT)
             info['disk'] = {
                 'total': self._format_bytes(disk.total),
                 'used': self._format_bytes(disk.used),
@@ -75,28 +176,33 @@ class SystemDiagnostics:
         except Exception as e:
             info['disk'] = {'error': str(e)}
         return info
+    @_ttl_cached(INSTALL_INFO_TTL)
     def check_pytorch_installation(self) -> Dict[str, Any]:
         """Check PyTorch installation and capabilities"""
         self.update_progress("Checking PyTorch installation...")
         pytorch_info = {}
         try:
-            import torch
+            # Cheap presence check, so a machine without torch never starts importing it
+            if importlib.util.find_spec('torch') is None:
+                raise ImportError("torch")
+            with _heavy_import_lock:
+                import torch
             pytorch_info['installed'] = True
             pytorch_info['version'] = torch.__version__
-            pytorch_info['cuda_available'] = torch.cuda.is_available()
-            if torch.cuda.is_available():
+            pytorch_info['cuda_available'] = _cuda_available()
+            if pytorch_info['cuda_available']:
                 pytorch_info['cuda_version'] = torch.version.cuda
                 pytorch_info['cudnn_version'] = torch.backends.cudnn.version()
                 pytorch_info['gpu_count'] = torch.cuda.device_count()
                 # Get GPU details
                 gpus = []
                 for i in range(torch.cuda.device_count()):
-                    gpu_props = torch.cuda.get_device_properties(i)
+                    gpu_props = _gpu_properties(i)
                     gpus.append({
                         'id': i,
-                        'name': gpu_props.name,
-                        'memory': self._format_bytes(gpu_props.total_memory),
-                        'capability': f"{gpu_props.major}.{gpu_props.minor}"
+                        'name': gpu_props['name'],
+                        'memory': self._format_bytes(gpu_props['total_memory']),
+                        'capability': gpu_props['capability']
                     })
                 pytorch_info['gpus'] = gpus
             else:
@@ -107,52 +213,49 @@ class SystemDiagnostics:
         except Exception as e:
             pytorch_info['error'] = str(e)
         return pytorch_info
+    @_ttl_cached(INSTALL_INFO_TTL)
     def check_dependencies(self) -> Dict[str, Any]:
         """Check required dependencies"""
         self.update_progress("Checking dependencies...")
         dependencies = {}
-        required_packages = [
-            'PyQt6', 'numpy', 'opencv-python', 'Pillow',
-            'requests', 'configparser', 'psutil'
-        ]
-        for package in required_packages:
+        # Distribution name -> import name. Versions come from the installed
+        # metadata, so none of these (cv2 and PyQt6 especially) get imported
+        required_packages = {
+            'PyQt6': 'PyQt6', 'numpy': 'numpy', 'opencv-python': 'cv2', 'Pillow': 'PIL',
+            'requests': 'requests', 'configparser': 'configparser', 'psutil': 'psutil'
+        }
+        for package, module_name in required_packages.items():
             try:
-                if package == 'opencv-python':
-                    import cv2
-                    dependencies[package] = {
-                        'installed': True,
-                        'version': cv2.__version__
-                    }
-                elif package == 'PyQt6':
-                    from PyQt6.QtCore import QT_VERSION_STR
+                dependencies[package] = {
+                    'installed': True,
+                    'version': dist_version(package)
+                }
+            except PackageNotFoundError:
+                # No metadata (e.g. the stdlib configparser); fall back to locating the module
+                if importlib.util.find_spec(module_name) is not None:
                     dependencies[package] = {
                         'installed': True,
-                        'version': QT_VERSION_STR
+                        'version': 'Unknown'
                     }
                 else:
-                    module = __import__(package.replace('-', '_'))
-                    version = getattr(module, '__version__', 'Unknown')
                     dependencies[package] = {
-                        'installed': True,
-                        'version': version
+                        'installed': False,
+                        'error': 'Not installed'
                     }
-            except ImportError:
-                dependencies[package] = {
-                    'installed': False,
-                    'error': 'Not installed'
-                }
             except Exception as e:
                 dependencies[package] = {
                     'installed': False,
                     'error': str(e)
                 }
         return dependencies
+    @_ttl_cached(INSTALL_INFO_TTL)
     def check_doctr_installation(self) -> Dict[str, Any]:
         """Check DocTR installation and configuration"""
         self.update_progress("Checking DocTR installation...")
         doctr_info = {}
         try:
-            import doctr
+            with _heavy_import_lock:
+                import doctr
             doctr_info['installed'] = True
             doctr_info['version'] = getattr(doctr, '__version__', 'Unknown')
             # Check backend detection
@@ -165,11 +268,12 @@ class SystemDiagnostics:
             # Check model cache
             cache_dir = Path.home() / ".cache" / "doctr" / "models"
             if cache_dir.exists():
-                cached_models = list(cache_dir.glob("*.pt"))
-                doctr_info['cached_models'] = len(cached_models)
-                doctr_info['cache_size'] = self._format_bytes(
-                    sum(f.stat().st_size for f in cached_models)
-                )
+                # One directory pass; scandir entries carry their stat where the OS allows
+                with os.scandir(cache_dir) as entries:
+                    model_sizes = [entry.stat().st_size for entry in entries
+                                   if entry.name.endswith(".pt") and entry.is_file()]
+                doctr_info['cached_models'] = len(model_sizes)
+                doctr_info['cache_size'] = self._format_bytes(sum(model_sizes))
             else:
                 doctr_info['cached_models'] = 0
                 doctr_info['cache_size'] = '0 B'
@@ -179,52 +283,80 @@ class SystemDiagnostics:
         except Exception as e:
             doctr_info['error'] = str(e)
         return doctr_info
+    @_ttl_cached(LIVE_STATS_TTL)
     def check_performance_metrics(self) -> Dict[str, Any]:
         """Check system performance metrics"""
         self.update_progress("Measuring performance metrics...")
         metrics = {}
         try:
-            # CPU usage over short period
-            cpu_percent = psutil.cpu_percent(interval=1)
-            metrics['cpu_usage'] = cpu_percent
-            # Memory usage
-            memory = psutil.virtual_memory()
-            metrics['memory_usage'] = memory.percent
-            # Disk I/O (if available)
-            try:
-                disk_io = psutil.disk_io_counters()
-                metrics['disk_read_speed'] = 'Available'
-                metrics['disk_write_speed'] = 'Available'
-            except:
-                metrics['disk_io'] = 'Not available'
-            # Network connectivity (basic check)
-            try:
-                import socket
-                socket.create_connection(("8.8.8.8", 53), timeout=3)
-                metrics['internet_connection'] = True
-            except:
-                metrics['internet_connection'] = False
+            # Let the connectivity probe run while the local readings are taken
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                internet_probe = executor.submit(self._check_internet_connection)
+                # CPU usage since the counters were armed in __init__
+                metrics['cpu_usage'] = psutil.cpu_percent(interval=None)
+                # Memory usage
+                memory = psutil.virtual_memory()
+                metrics['memory_usage'] = memory.percent
+                # Disk I/O (if available)
+                try:
+                    disk_io = psutil.disk_io_counters()
+                    metrics['disk_read_speed'] = 'Available'
+                    metrics['disk_write_speed'] = 'Available'
+                except:
+                    metrics['disk_io'] = 'Not available'
+                # Network connectivity (basic check)
+                metrics['internet_connection'] = internet_probe.result()
         except Exception as e:
             metrics['error'] = str(e)
         return metrics
+    def _check_internet_connection(self) -> bool:
+        """Basic connectivity check: is there a route to a public DNS server"""
+        try:
+            # A UDP connect sends nothing; it only resolves the route, so an
+            # unreachable network fails at once instead of waiting on a handshake
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                sock.settimeout(INTERNET_PROBE_TIMEOUT)
+                sock.connect(INTERNET_PROBE_ADDR)
+                return True
+        except OSError:
+            return False
+    @_ttl_cached(LIVE_STATS_TTL)
     def run_quick_diagnostics(self) -> Dict[str, Any]:
+        """Run quick diagnostics, reusing the startup cache while the interpreter is unchanged"""
+        from utils.startup_cache import startup_cache
+        interpreter_key = _interpreter_key()
+        cached = startup_cache.get_cached_system_info()
+        if cached and cached.get('interpreter_key') == interpreter_key and 'quick_diagnostics' in cached:
+            return cached['quick_diagnostics']
+        diagnostics = self._probe_quick_diagnostics()
+        if 'error' not in diagnostics:
+            startup_cache.cache_system_info({
+                'interpreter_key': interpreter_key,
+                'quick_diagnostics': diagnostics
+            })
+        return diagnostics
+    def _probe_quick_diagnostics(self) -> Dict[str, Any]:
         """Run quick diagnostics for caching"""
         diagnostics = {}
         try:
             # Quick system check
             diagnostics['memory_gb'] = round(psutil.virtual_memory().total / (1024**3), 1)
-            diagnostics['cpu_cores'] = psutil.cpu_count()
+            diagnostics['cpu_cores'] = _cpu_counts()[1]
             # Quick PyTorch check
             try:
-                import torch
+                if importlib.util.find_spec('torch') is None:
+                    raise ImportError("torch")
+                with _heavy_import_lock:
+                    import torch
                 diagnostics['pytorch'] = True
-                diagnostics['cuda'] = torch.cuda.is_available()
+                diagnostics['cuda'] = _cuda_available()
             except:
                 diagnostics['pytorch'] = False
                 diagnostics['cuda'] = False
             # Quick DocTR check
             try:
-                import doctr
+                with _heavy_import_lock:
+                    import doctr
                 diagnostics['doctr'] = True
             except:
                 diagnostics['doctr'] = False
@@ -236,23 +368,41 @@ class SystemDiagnostics:
         if quick:
             return self.run_quick_diagnostics()
         self.update_progress("Starting system diagnostics...")
-        diagnostics = {
-            'timestamp': time.time(),
-            'system_info': self.get_system_info(),
-            'pytorch': self.check_pytorch_installation(),
-            'dependencies': self.check_dependencies(),
-            'doctr': self.check_doctr_installation(),
-            'performance': self.check_performance_metrics()
+        checks = {
+            'system_info': self.get_system_info,
+            'pytorch': self.check_pytorch_installation,
+            'dependencies': self.check_dependencies,
+            'doctr': self.check_doctr_installation,
+            'performance': self.check_performance_metrics
         }
+        # The checks are independent and mostly wait on imports, disk and network,
+        # so run them side by side
+        if hasattr(os, 'sched_getaffinity'):
+            cpu_count = len(os.sched_getaffinity(0))
+        else:
+            cpu_count = os.cpu_count() or 1
+        diagnostics = {'timestamp': time.time()}
+        deferred = self._deferred_progress = queue.SimpleQueue()
+        try:
+            with ThreadPoolExecutor(max_workers=min(len(checks), cpu_count),
+                                    thread_name_prefix="Diagnostics") as executor:
+                futures = {name: executor.submit(check) for name, check in checks.items()}
+                for _ in as_completed(futures.values()):
+                    self._flush_deferred_progress(deferred)
+        finally:
+            self._deferred_progress = None
+            self._flush_deferred_progress(deferred)
+        for name, future in futures.items():
+            diagnostics[name] = future.result()
         self.update_progress("System diagnostics complete")
         return diagnostics
-    def _format_bytes(self, bytes_size: int) -> str:
+    @staticmethod
+    def _format_bytes(bytes_size: int) -> str:
         """Format bytes to human readable string"""
-        for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-            if bytes_size < 1024.0:
-                return f"{bytes_size:.1f} {unit}"
-            bytes_size /= 1024.0
-        return f"{bytes_size:.1f} PB"
+        bytes_size = int(bytes_size)
+        # Each unit is 2**10 of the previous one, so the bit length picks it directly
+        exponent = max(0, min((bytes_size.bit_length() - 1) // 10, len(_BYTE_UNITS) - 1))
+        return f"{bytes_size / (1 << (exponent * 10)):.1f} {_BYTE_UNITS[exponent]}"
     def get_diagnostic_summary(self, diagnostics: Dict[str, Any]) -> str:
         """Generate a human-readable diagnostic summary"""
         summary_lines = []
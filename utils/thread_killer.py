@@ -2,14 +2,24 @@ import threading
 import gc
 import logging
 import sys
-import os
-import signal
-import ctypes
 from concurrent.futures import ThreadPoolExecutor
-import inspect
-import queue
+from functools import lru_cache
 import time
 logger = logging.getLogger(__name__)
+# Threads whose casefolded names contain one of these belong to Qt and must never be killed
+_PROTECTED_NAMES = frozenset({"qt", "pyqt"})
+@lru_cache(maxsize=None)
+def _async_exc():
+    """
+    PyThreadState_SetAsyncExc with its C signature declared, or None where ctypes
+    cannot reach it. Looked up on first use so importing this module stays cheap.
+    """
+    import ctypes
+    func = getattr(getattr(ctypes, 'pythonapi', None), 'PyThreadState_SetAsyncExc', None)
+    if func is not None:
+        func.argtypes = [ctypes.c_ulong, ctypes.py_object]
+        func.restype = ctypes.c_int
+    return func
 class ThreadKiller:
     """Static utility class to help terminate problematic threads"""
     @staticmethod
@@ -24,14 +34,13 @@ class ThreadKiller:
             return
         try:
             # Use ctypes to forcefully terminate thread - platform specific
-            if hasattr(ctypes, 'pythonapi') and hasattr(ctypes.pythonapi, 'PyThreadState_SetAsyncExc'):
-                res = ctypes.pythonapi.PyThreadState_SetAsyncExc(
-                    ctypes.c_long(thread_id),
-                    ctypes.py_object(SystemExit)
-                )
+            set_async_exc = _async_exc()
+            if set_async_exc is not None:
+                import ctypes
+                res = set_async_exc(thread_id, SystemExit)
                 if res > 1:
-                    # If more than one thread affected, reset the effect
-                    ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_long(thread_id), None)
+                    # If more than one thread affected, reset the effect (a NULL exception)
+                    set_async_exc(thread_id, ctypes.py_object())
                     logger.warning(f"Failed to terminate thread {thread_id} cleanly")
                 elif res == 1:
                     logger.debug(f"Successfully terminated thread {thread_id}")
@@ -45,45 +54,57 @@ class ThreadKiller:
     def terminate_all_threads():
         """Attempt to terminate all non-main, non-critical threads."""
         try:
-            current_thread = threading.current_thread()
-            main_thread = threading.main_thread()
-            # Identify all active threads
+            skip = {threading.current_thread(), threading.main_thread()}
+            # Identify all active threads in a single snapshot
             active_threads = threading.enumerate()
-            qt_threads = [t for t in active_threads
-                         if "Qt" in t.name or "PyQt" in t.name]
             # Only terminate threads that aren't main, current, or Qt threads
-            for thread in active_threads:
-                if (thread != current_thread and
-                    thread != main_thread and
-                    thread not in qt_threads and
-                    thread.is_alive()):
-                    logger.debug(f"Terminating thread: {thread.name} ({thread.ident})")
-                    ThreadKiller.terminate_thread(thread)
+            if len(active_threads) > len(skip):
+                for thread in active_threads:
+                    if thread in skip:
+                        continue
+                    thread_name = thread.name.casefold()
+                    if (not any(name in thread_name for name in _PROTECTED_NAMES) and
+                        thread.is_alive()):
+                        logger.debug(f"Terminating thread: {thread.name} ({thread.ident})")
+                        ThreadKiller.terminate_thread(thread)
             # Force garbage collection
             gc.collect()
         except Exception as e:
             logger.error(f"Error terminating threads: {e}")
     @staticmethod
-    def terminate_thread_pool(executor):
-        """Terminate a thread pool executor forcefully."""
+    def terminate_thread_pool(executor, grace_period=2.0):
+        """
+        Terminate a thread pool executor. Workers get grace_period seconds to notice
+        their cancellation flag and return; only those still running are killed.
+        """
         if not executor or not isinstance(executor, ThreadPoolExecutor):
             return
         try:
             # First try gentle shutdown
             executor.shutdown(wait=False, cancel_futures=True)
-            # Then forcefully terminate remaining worker threads
+            # Then forcefully terminate worker threads that did not finish in time
             if hasattr(executor, "_threads"):
-                for thread in list(executor._threads):
-                    if thread.is_alive():
-                        ThreadKiller.terminate_thread(thread)
+                threads = list(executor._threads)
+                deadline = time.monotonic() + grace_period
+                for thread in threads:
+                    thread.join(max(0.0, deadline - time.monotonic()))
+                stuck = [thread for thread in threads if thread.is_alive()]
+                for thread in stuck:
+                    ThreadKiller.terminate_thread(thread)
+                if stuck:
+                    logger.warning(f"Force-terminated {len(stuck)}/{len(threads)} pool threads "
+                                   f"still running after {grace_period:.1f}s")
         except Exception as e:
             logger.error(f"Error terminating thread pool: {e}")
     @staticmethod
     def get_current_thread_stack():
         """Get stack trace information for the current thread."""
         try:
-            stack = inspect.stack()
-            stack_info = "\n".join([f"{frame.filename}:{frame.lineno} - {frame.function}"
+            import traceback
+            # Unlike inspect.stack(), this reads no source files; innermost frame first as before
+            stack = traceback.StackSummary.extract(traceback.walk_stack(sys._getframe()),
+                                                   lookup_lines=False)
+            stack_info = "\n".join([f"{frame.filename}:{frame.lineno} - {frame.name}"
                                    for frame in stack])
             return stack_info
         except Exception as e:
@@ -91,32 +112,30 @@ class ThreadKiller:
     @staticmethod
     def safe_kill_processes(pids, timeout=3):
         """Safely kill processes by PID with timeout"""
+        import psutil
         if not isinstance(pids, (list, set)):
             pids = [pids]
-        killed = []
+        procs = []
         for pid in pids:
             try:
                 # First try SIGTERM for graceful shutdown
-                os.kill(pid, signal.SIGTERM)
-                killed.append(pid)
-            except (ProcessLookupError, PermissionError):
+                proc = psutil.Process(pid)
+                proc.terminate()
+                procs.append(proc)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
                 # Process doesn't exist or permission denied
                 pass
             except Exception as e:
                 logger.warning(f"Error sending SIGTERM to {pid}: {e}")
-        # Give processes time to terminate
-        if killed and timeout > 0:
-            time.sleep(timeout)
+        # Returns as soon as every process has exited, or after timeout at the latest
+        _, alive = psutil.wait_procs(procs, timeout=max(timeout, 0))
         # Force kill any remaining processes
-        for pid in killed:
+        for proc in alive:
             try:
-                # Check if process still exists
-                os.kill(pid, 0)
-                # If we get here, process still exists, force kill
-                os.kill(pid, signal.SIGKILL)
-                logger.debug(f"Force killed process {pid}")
-            except (ProcessLookupError, PermissionError):
+                proc.kill()
+                logger.debug(f"Force killed process {proc.pid}")
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
                 # Process doesn't exist or permission denied - already gone
                 pass
             except Exception as e:
-                logger.warning(f"Error force-killing {pid}: {e}")
+                logger.warning(f"Error force-killing {proc.pid}: {e}")
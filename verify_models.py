@@ -1,17 +1,28 @@
+import os
 from pathlib import Path
-from doctr import models
 cache_dir = Path.home() / ".cache" / "doctr" / "models"
 required_models = ["db_resnet50.pt", "parseq.pt"]
-# Check for each model
+# Scan the cache once; files are named <model>-<hash>.pt, so keep the model names
+if cache_dir.is_dir():
+    with os.scandir(cache_dir) as entries:
+        cached_models = {entry.name[:-3].split("-", 1)[0]
+                         for entry in entries if entry.name.endswith(".pt")}
+else:
+    cached_models = set()
 def model_exists(name):
-    return any(p.name.startswith(name) for p in cache_dir.glob("*.pt"))
+    return name in cached_models
 print("Verifying DocTR models...")
-if not model_exists("db_resnet50"):
+has_detection = model_exists("db_resnet50")
+has_recognition = model_exists("parseq")
+# Importing doctr pulls in torch and the model zoo; only pay for it when downloading
+if not (has_detection and has_recognition):
+    from doctr import models
+if not has_detection:
     print("Downloading db_resnet50 (text detection)...")
     models.detection.db_resnet50(pretrained=True)
 else:
     print("db_resnet50 model already present.")
-if not model_exists("parseq"):
+if not has_recognition:
     print("Downloading parseq (text recognition)...")
     models.recognition.parseq(pretrained=True)
 else: